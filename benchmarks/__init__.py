@@ -0,0 +1,2 @@
+# Micro-benchmarks, run from the repository root, e.g. python -m benchmarks.replay_sampling
+# python -m benchmarks runs the whole suite, see benchmarks/__main__.py
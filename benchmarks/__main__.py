@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+import torch
+from benchmarks import env, replay_sampling, learner, inference
+
+# python -m benchmarks [--output results.json] [--baseline baseline.json] [--quick]
+# Every metric is a rate, higher is better.
+
+
+def collect(quick=False):
+    metrics = env.run(trace_length=500 if quick else env.TRACE_LENGTH)
+
+    capacities = [10_000] if quick else [10_000, 1_000_000]
+    for r in replay_sampling.run(capacities):
+        metrics[f"replay.samples_per_s.{r['capacity']}"] = replay_sampling.BATCH_SIZE / (r["new_us"] * 1e-6)
+
+    for r in learner.run([64, 512] if quick else [64, 512, 4096], modes=[None]):
+        metrics[f"learner.updates_per_s.{r['batch_size']}"] = r["steps_per_s"]
+
+    for r in inference.run([1, 256]):
+        metrics[f"inference.actions_per_s.{r['batch_size']}"] = r["numpy_actions_per_s"]
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    """Print current vs baseline per metric; returns the metrics that got slower by more than tolerance."""
+    regressions = []
+    print(f"{'metric':<36} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name, value in metrics.items():
+        if name not in baseline:
+            print(f"{name:<36} {'-':>12} {value:12.0f}")
+            continue
+        ratio = value / baseline[name]
+        flag = ""
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+            flag = "  slower"
+        print(f"{name:<36} {baseline[name]:12.0f} {value:12.0f} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless throughput benchmarks.")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier --output run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="slowdown flagged as a regression (default 0.1)")
+    parser.add_argument("--quick", action="store_true", help="shorter traces and fewer sizes")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads (default 1)")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    np.random.seed(0)
+    torch.manual_seed(0)
+    metrics = collect(args.quick)
+
+    results = {
+        "metrics": metrics,
+        "info": {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                 "numpy": np.__version__, "torch": torch.__version__, "machine": platform.machine(),
+                 "cpus": os.cpu_count(), "threads": args.threads, "quick": args.quick},
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["metrics"]
+        regressions = compare(metrics, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+    else:
+        for name, value in metrics.items():
+            print(f"{name:<36} {value:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
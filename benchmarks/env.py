@@ -0,0 +1,118 @@
+import math
+import time
+import numpy as np
+import game_env
+from vector_env import VectorRacingEnv
+
+TRACE_LENGTH = 2000
+N_POSES = 256
+REPEATS = 3  # timed runs per trace, the fastest one counts
+
+
+def make_trace(name, length=TRACE_LENGTH, seed=0):
+    """Scripted action sequences, the same every run so numbers stay comparable."""
+    if name == "idle":
+        return np.zeros(length, dtype=int)
+    if name == "straight":
+        return np.full(length, 4)
+    if name == "weave":
+        return np.resize([4, 4, 2, 4, 4, 3], length)
+    if name == "random":
+        return np.random.default_rng(seed).integers(0, 5, length)
+    raise ValueError(f"Unknown trace {name!r}")
+
+
+TRACES = ["idle", "straight", "weave", "random"]
+
+
+def env_steps_per_second(trace, repeats=REPEATS):
+    env = game_env.RacingEnv(headless=True)
+    best = math.inf
+    for _ in range(repeats):
+        env.reset()
+        start = time.perf_counter()
+        for action in trace:
+            _, _, done = env.step(int(action))
+            if done:
+                env.reset()
+        best = min(best, time.perf_counter() - start)
+    return len(trace) / best
+
+
+def vector_env_steps_per_second(n_envs=64, n_steps=200, seed=0, repeats=REPEATS, sdf=False):
+    env = VectorRacingEnv(n_envs, sdf=sdf)
+    actions = np.random.default_rng(seed).integers(0, 5, (n_steps, n_envs))
+    best = math.inf
+    for _ in range(repeats):
+        env.reset()
+        start = time.perf_counter()
+        for step_actions in actions:
+            env.step(step_actions)
+        best = min(best, time.perf_counter() - start)
+    return n_envs * n_steps / best
+
+
+def random_cars(n=N_POSES, seed=0):
+    """Cars spread over the track area with random grid headings."""
+    rng = np.random.default_rng(seed)
+    cars = []
+    for x, y, k in zip(rng.uniform(20, 980, n), rng.uniform(20, 580, n), rng.integers(0, 24, n)):
+        car = game_env.Car(x, y)
+        car.target_angle = car.angle = math.radians(15 * k)
+        car.update_corners()
+        cars.append(car)
+    return cars
+
+
+def rays_per_second(cars, env, min_time=0.5):
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for car in cars:
+            car.cast(env.wall_segments, env.wall_grid, env.sdf)
+        calls += len(cars)
+    return calls * len(game_env.RAY_ANGLES) / (time.perf_counter() - start)
+
+
+def collisions_per_second(cars, env, min_time=0.5):
+    outlines = [car.outline() for car in cars]
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for outline in outlines:
+            env.collider.first_hit(outline)
+        calls += len(outlines)
+    return calls / (time.perf_counter() - start)
+
+
+def batched_collisions_per_second(cars, env, min_time=0.5):
+    corners = np.array([car.outline() for car in cars])
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        env.collider.first_hits(corners)
+        calls += len(corners)
+    return calls / (time.perf_counter() - start)
+
+
+def run(traces=TRACES, trace_length=TRACE_LENGTH):
+    results = {}
+    for name in traces:
+        results[f"env.steps_per_s.{name}"] = env_steps_per_second(make_trace(name, trace_length))
+    results["vector_env.steps_per_s"] = vector_env_steps_per_second()
+
+    env = game_env.RacingEnv(headless=True)
+    cars = random_cars()
+    results["raycast.rays_per_s"] = rays_per_second(cars, env)
+    results["collision.checks_per_s"] = collisions_per_second(cars, env)
+    results["collision.batched_checks_per_s"] = batched_collisions_per_second(cars, env)
+
+    # Same measurements on the signed distance field backend
+    sdf_env = game_env.RacingEnv(headless=True, sdf=True)
+    results["sdf.vector_env.steps_per_s"] = vector_env_steps_per_second(sdf=True)
+    results["sdf.rays_per_s"] = rays_per_second(cars, sdf_env)
+    results["sdf.checks_per_s"] = collisions_per_second(cars, sdf_env)
+    results["sdf.batched_checks_per_s"] = batched_collisions_per_second(cars, sdf_env)
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<36} {value:12.0f}")
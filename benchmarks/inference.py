@@ -0,0 +1,45 @@
+import numpy as np
+import torch
+from dqn import DQNAgent
+from benchmarks.replay_sampling import time_per_call
+
+BATCH_SIZES = [1, 32, 256]
+INPUT_DIMS = 19
+
+
+def old_path(agent, state):
+    # What choose_action did before: new tensor per call, autograd on, argmax().item()
+    actions = agent.q_eval(torch.tensor(state, dtype=torch.float32))
+    return torch.argmax(actions).item()
+
+
+def no_grad_path(agent, states):
+    with torch.no_grad():
+        return torch.argmax(agent.q_eval(torch.from_numpy(states)), dim=-1)
+
+
+def run(batch_sizes=BATCH_SIZES):
+    agent = DQNAgent(alpha=0.0005, gamma=0.99, n_actions=5, epsilon=0.0, batch_size=512, input_dims=INPUT_DIMS)
+    results = []
+    for batch_size in batch_sizes:
+        states = np.random.random((batch_size, INPUT_DIMS)).astype(np.float32)
+        if batch_size == 1:
+            states = states[0]
+            old = time_per_call(lambda: old_path(agent, states))
+        else:
+            old = None
+        no_grad = time_per_call(lambda: no_grad_path(agent, states))
+        numpy = time_per_call(lambda: agent.policy.act(states))
+        results.append({"batch_size": batch_size,
+                        "old_actions_per_s": batch_size / old if old else None,
+                        "no_grad_actions_per_s": batch_size / no_grad,
+                        "numpy_actions_per_s": batch_size / numpy})
+    return results
+
+
+if __name__ == "__main__":
+    torch.set_num_threads(1)
+    for r in run():
+        old = f"{r['old_actions_per_s']:10.0f}" if r["old_actions_per_s"] else f"{'-':>10}"
+        print(f"batch {r['batch_size']:>4}: choose_action (old) {old}/s   torch no_grad {r['no_grad_actions_per_s']:10.0f}/s"
+              f"   NumpyPolicy {r['numpy_actions_per_s']:10.0f}/s")
@@ -0,0 +1,51 @@
+import sys
+import time
+import numpy as np
+import torch
+from dqn import DQNAgent
+
+BATCH_SIZES = [64, 256, 1024, 4096]
+MODES = [None, "script", "compile"]
+INPUT_DIMS = 19
+MEM_SIZE = 100_000
+
+
+def make_agent(batch_size, mode, num_threads):
+    agent = DQNAgent(alpha=0.0005, gamma=0.99, n_actions=5, epsilon=0.0, batch_size=batch_size,
+                     input_dims=INPUT_DIMS, mem_size=MEM_SIZE, compile_learn=mode, num_threads=num_threads)
+    states = np.random.random((MEM_SIZE, INPUT_DIMS)).astype(np.float32)
+    agent.memory.store_batch(states, np.random.randint(0, 5, MEM_SIZE), np.random.random(MEM_SIZE),
+                             np.roll(states, -1, axis=0), np.random.random(MEM_SIZE) < 0.01)
+    return agent
+
+
+def steps_per_second(agent, min_time=1.0):
+    # The first calls pay for tracing / compilation
+    start = time.perf_counter()
+    for _ in range(3):
+        agent.learn()
+    warmup = time.perf_counter() - start
+
+    steps, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        agent.learn()
+        steps += 1
+    return steps / (time.perf_counter() - start), warmup
+
+
+def run(batch_sizes=BATCH_SIZES, modes=MODES, num_threads=None):
+    results = []
+    for batch_size in batch_sizes:
+        for mode in modes:
+            rate, warmup = steps_per_second(make_agent(batch_size, mode, num_threads))
+            results.append({"batch_size": batch_size, "mode": mode or "eager", "steps_per_s": rate,
+                            "warmup_s": warmup, "threads": torch.get_num_threads()})
+    return results
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.learner [num_threads]
+    num_threads = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    for r in run(num_threads=num_threads):
+        print(f"batch {r['batch_size']:>5}  {r['mode']:>8}: {r['steps_per_s']:8.1f} steps/s"
+              f"   (warmup {r['warmup_s']:.2f}s, {r['threads']} threads)")
@@ -0,0 +1,46 @@
+import time
+import torch
+from dqn import ReplayBuffer, ReplayBatch
+
+CAPACITIES = [10_000, 1_000_000, 10_000_000]
+BATCH_SIZE = 512
+INPUT_DIMS = 19
+
+
+def time_per_call(fn, min_time=0.5):
+    fn()
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+
+def old_path(memory, batch_size):
+    # What DQNAgent.learn did before: permutation sample, fancy-index copies, torch.tensor copies
+    states, actions, rewards, states_, terminal = memory.sample_buffer(batch_size)
+    return (torch.tensor(states, dtype=torch.float32), torch.tensor(actions, dtype=torch.long),
+            torch.tensor(rewards, dtype=torch.float32), torch.tensor(states_, dtype=torch.float32),
+            torch.tensor(terminal, dtype=torch.float32))
+
+
+def run(capacities=CAPACITIES, batch_size=BATCH_SIZE):
+    results = []
+    for capacity in capacities:
+        memory = ReplayBuffer(capacity, INPUT_DIMS, 5)
+        # Pretend the buffer is full; untouched pages read as zeros
+        memory.mem_cntr = capacity
+        batch = ReplayBatch(batch_size, INPUT_DIMS)
+
+        old = time_per_call(lambda: old_path(memory, batch_size))
+        new = time_per_call(lambda: memory.sample_into(batch))
+        results.append({"capacity": capacity, "old_us": old * 1e6, "new_us": new * 1e6, "speedup": old / new})
+        del memory
+    return results
+
+
+if __name__ == "__main__":
+    print(f"batch size {BATCH_SIZE}")
+    for r in run():
+        print(f"capacity {r['capacity']:>10}: sample_buffer + torch.tensor {r['old_us']:10.1f} us"
+              f"   sample_into {r['new_us']:8.1f} us   x{r['speedup']:.1f}")
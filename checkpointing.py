@@ -0,0 +1,97 @@
+import os
+import queue
+import threading
+import torch
+
+
+class CheckpointManager:
+    """
+    Full training-state checkpoints (networks, optimizer, epsilon, learn step and replay buffer)
+    written from a background thread.
+
+    save() takes a snapshot of the agent on the calling thread (a copy, so training can go on)
+    and queues it; the writer thread torch.saves it under a temp name and renames it into place,
+    so a crash mid-write never leaves a truncated checkpoint. Only the newest keep checkpoints
+    are kept. restore() loads the newest one back into an agent.
+    """
+
+    def __init__(self, directory, keep=3, include_memory=True):
+        self.directory = directory
+        self.keep = keep
+        self.include_memory = include_memory
+        os.makedirs(directory, exist_ok=True)
+
+        # At most one snapshot waiting behind the one being written, save() blocks beyond that
+        self.queue = queue.Queue(maxsize=1)
+        self.error = None
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def checkpoints(self):
+        """Checkpoint paths, oldest first."""
+        names = [name for name in os.listdir(self.directory) if name.startswith("checkpoint_") and name.endswith(".pt")]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def latest(self):
+        paths = self.checkpoints()
+        return paths[-1] if paths else None
+
+    def save(self, agent, step, extra=None):
+        """
+        Args:
+            agent: the DQNAgent to snapshot.
+            step: number used to name and order the checkpoint (e.g. the episode).
+            extra: optional picklable dict stored alongside, handed back by restore().
+        """
+        if self.error is not None:
+            raise self.error
+        state = {"agent": agent.state_dict(self.include_memory), "step": step, "extra": extra}
+        self.queue.put(state)
+
+    def _write_loop(self):
+        while True:
+            state = self.queue.get()
+            if state is None:
+                return
+            try:
+                self._write(state)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _write(self, state):
+        path = os.path.join(self.directory, f"checkpoint_{state['step']:08d}.pt")
+        with open(path + ".tmp", "wb") as file:
+            torch.save(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+
+        for old in self.checkpoints()[:-self.keep]:
+            os.remove(old)
+
+    def restore(self, agent, path=None):
+        """
+        Load a checkpoint (the newest if path is None) into agent.
+
+        Returns:
+            (step, extra) as given to save(), or None if there is no checkpoint.
+        """
+        path = self.latest() if path is None else path
+        if path is None:
+            return None
+        state = torch.load(path, weights_only=False)
+        agent.load_state_dict(state["agent"])
+        return state["step"], state["extra"]
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk."""
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.wait()
+        self.queue.put(None)
+        self.writer.join()
@@ -1,11 +1,14 @@
 import game_env
 import pygame
 from dqn import DQNAgent
+from trajectory import TrajectoryRecorder
 import numpy as np
 
 TOTAL_GAMETIME = 1000  # Max game time for one episode
 N_EPISODES = 10000
 REPLACE_TARGET = 50
+DEMO_DIR = "demonstrations"  # recorded transitions, read back with trajectory.TrajectoryReader
+COMPRESS = False  # .npz chunks instead of memory-mappable .npy columns
 
 game = game_env.RacingEnv()
 game.fps = 30
@@ -21,9 +24,10 @@ ddqn_scores = []
 eps_history = []
 
 
+recorder = TrajectoryRecorder(DEMO_DIR, input_dims=19, compress=COMPRESS)
+
+
 def run():
-    output_file = "observations.txt"
-    file = open(output_file, "a")
     for e in range(N_EPISODES):
         game.reset()  # reset env
 
@@ -63,17 +67,18 @@ def run():
             else:
                 counter = 0
 
-            score += reward
-            file.write(f"{observation}, {action}, {reward}, {observation_}, {int(done)}\n")
-            #dqn_agent.remember(observation, action, reward, observation_, int(done))
-            observation = observation_
-            #dqn_agent.learn()
-
             gtime += 1
 
+            # Apply the time limit before recording so the last step closes the episode
             if gtime >= TOTAL_GAMETIME:
                 done = True
 
+            score += reward
+            recorder.record(observation, action, reward, observation_, done)
+            #dqn_agent.remember(observation, action, reward, observation_, int(done))
+            observation = observation_
+            #dqn_agent.learn()
+
             if renderFlag:
                 game.render(action)
 
@@ -81,7 +86,8 @@ def run():
         ddqn_scores.append(score)
         avg_score = np.mean(ddqn_scores[max(0, e - 100):(e + 1)])
 
-    file.close()
-
 
-run()
+try:
+    run()
+finally:
+    recorder.close()
@@ -0,0 +1,89 @@
+import numpy as np
+from raycast import GRID_MIN_SEGMENTS
+
+
+class WallCollider:
+    """
+    Car/wall collision against a static wall set.
+
+    Broad phase: the car's axis-aligned bounding box is tested against the precomputed
+    bounds of every wall in one vectorized comparison (or only against the walls in the
+    grid cells under the car on large tracks). Narrow phase: the surviving walls get the
+    exact segment test from Car.collision, stopping at the first hit.
+    """
+
+    def __init__(self, segments, grid=None, bounds=None):
+        self.segments = segments
+        if bounds is None:
+            bounds = np.concatenate((np.minimum(segments[:, 0:2], segments[:, 2:4]),
+                                     np.maximum(segments[:, 0:2], segments[:, 2:4])), axis=1)
+        self.bounds = bounds
+        self.grid = grid if grid is not None and len(segments) >= GRID_MIN_SEGMENTS else None
+        # Plain tuples are faster than array indexing in the scalar narrow phase
+        self.rows = [tuple(row) for row in segments.tolist()]
+
+    def candidates(self, xmin, ymin, xmax, ymax):
+        """Indices of the walls whose bounds overlap the box, in ascending order."""
+        walls = self.grid.box_candidates(xmin, ymin, xmax, ymax) if self.grid is not None else slice(None)
+        b = self.bounds[walls]
+        overlap = (b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)
+        if self.grid is not None:
+            return walls[overlap]
+        return np.flatnonzero(overlap)
+
+    def first_hit(self, outline):
+        """
+        Args:
+            outline: the car's four corners as (x, y) pairs, in order around the car.
+
+        Returns:
+            Index of the first wall the outline crosses, or -1.
+        """
+        xs = [p[0] for p in outline]
+        ys = [p[1] for p in outline]
+        for i in self.candidates(min(xs), min(ys), max(xs), max(ys)).tolist():
+            x1, y1, x2, y2 = self.rows[i]
+            for j in range(4):
+                x3, y3 = outline[j]
+                x4, y4 = outline[(j + 1) % 4]
+
+                denominator = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+                if denominator == 0:
+                    continue  # Lines are parallel, no collision
+
+                t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / denominator
+                u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / denominator
+                if 0 < t < 1 and 0 < u < 1:
+                    return i
+        return -1
+
+    def first_hits(self, corners):
+        """
+        Batched first_hit for (N, 4, 2) car corners; returns (N,) wall indices, -1 where nothing is hit.
+        """
+        lo, hi = corners.min(axis=1), corners.max(axis=1)
+        b = self.bounds
+        overlap = ((b[:, 0] <= hi[:, 0:1]) & (b[:, 2] >= lo[:, 0:1]) &
+                   (b[:, 1] <= hi[:, 1:2]) & (b[:, 3] >= lo[:, 1:2]))
+        cars, walls = np.nonzero(overlap)
+
+        hits = np.full(len(corners), -1)
+        if len(cars) == 0:
+            return hits
+
+        x1, y1, x2, y2 = (self.segments[walls, i][:, None] for i in range(4))
+        start = corners[cars]
+        end = np.roll(corners, -1, axis=1)[cars]
+        x3, y3 = start[..., 0], start[..., 1]
+        x4, y4 = end[..., 0], end[..., 1]
+
+        denominator = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / denominator
+            u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / denominator
+        crossed = ((denominator != 0) & (0 < t) & (t < 1) & (0 < u) & (u < 1)).any(axis=1)
+
+        # Pairs are ordered by car then wall, so each car's first crossed pair has its lowest wall index
+        hit_cars, first = np.unique(cars[crossed], return_index=True)
+        hits[hit_cars] = walls[crossed][first]
+        return hits
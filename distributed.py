@@ -0,0 +1,201 @@
+import queue
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+import game_env
+from dqn import DQNAgent, DQNetwork, NumpyPolicy, ReplayBuffer, SharedReplayBuffer
+
+# Ape-X style training: N_ACTORS worker processes each run their own headless RacingEnv
+# with a periodically refreshed copy of the network and ship transitions to the learner,
+# which owns the DQNAgent and its replay buffer.
+
+N_ACTORS = 4
+ACTOR_EPSILON = 0.4  # actor i explores with ACTOR_EPSILON ** (1 + EPSILON_ALPHA * i / (N_ACTORS - 1))
+EPSILON_ALPHA = 7
+SYNC_INTERVAL = 100  # learner updates between weight publications
+SEND_INTERVAL = 50  # transitions an actor batches up before sending them
+N_UPDATES = 1000000
+SAVE_INTERVAL = 10000
+SHARED_REPLAY = True  # actors write straight into a shared-memory replay buffer instead of the queue
+MEM_SIZE = 100000
+
+TOTAL_GAMETIME = 1000  # Max game time for one episode
+REPLACE_TARGET = 50
+INPUT_DIMS = 19
+N_ACTIONS = 5
+
+
+def actor_epsilons(n_actors, epsilon=ACTOR_EPSILON, alpha=EPSILON_ALPHA):
+    """Per-actor exploration rates from the Ape-X paper, from epsilon down to epsilon ** (1 + alpha)."""
+    if n_actors == 1:
+        return [epsilon]
+    return [epsilon ** (1 + alpha * i / (n_actors - 1)) for i in range(n_actors)]
+
+
+def actor(actor_id, epsilon, shared_net, version, lock, transitions, stop, replay=None, send_interval=SEND_INTERVAL):
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(actor_id)
+
+    # replay is (name, mem_size, lock) of the learner's SharedReplayBuffer
+    memory = SharedReplayBuffer.attach(replay[0], replay[1], INPUT_DIMS, N_ACTIONS, replay[2]) if replay else None
+
+    game = game_env.RacingEnv(headless=True)
+    net = DQNetwork(INPUT_DIMS, N_ACTIONS)
+    # Views of net's weights, so load_state_dict below updates it too
+    policy = NumpyPolicy(net)
+    local_version = -1
+
+    states, actions, rewards, states_, dones = [], [], [], [], []
+
+    def send():
+        if states:
+            batch = (np.array(states, dtype=np.float32), np.array(actions), np.array(rewards, dtype=np.float32),
+                     np.array(states_, dtype=np.float32), np.array(dones, dtype=np.float32))
+            if memory is not None:
+                memory.store_batch(*batch)
+            else:
+                transitions.put(("transitions",) + batch)
+            for column in (states, actions, rewards, states_, dones):
+                column.clear()
+
+    while not stop.is_set():
+        game.reset()
+        observation, reward, done = game.step(0)
+        score = 0
+        gtime = 0
+
+        while not done and not stop.is_set():
+            # Pick up the newest weights the learner has published
+            if version.value != local_version:
+                with lock:
+                    net.load_state_dict(shared_net.state_dict())
+                    local_version = version.value
+
+            if rng.random() < epsilon:
+                action = int(rng.integers(N_ACTIONS))
+            else:
+                action = int(policy.act(observation))
+
+            observation_, reward, done = game.step(action)
+            score += reward
+            gtime += 1
+
+            states.append(observation)
+            actions.append(action)
+            rewards.append(reward)
+            # Terminal next states are masked out by the learner, store zeros instead of None
+            states_.append(observation_ if not done else np.zeros(INPUT_DIMS))
+            dones.append(done)
+            observation = observation_
+
+            if gtime >= TOTAL_GAMETIME:
+                done = True
+            if len(states) >= send_interval:
+                send()
+
+        send()
+        transitions.put(("episode", actor_id, score))
+
+    if memory is not None:
+        memory.close()
+
+
+def publish(agent, shared_net, version, lock):
+    with lock:
+        shared_net.load_state_dict(agent.q_eval.state_dict())
+        version.value += 1
+
+
+def run(n_actors=N_ACTORS, epsilons=None, sync_interval=SYNC_INTERVAL, n_updates=N_UPDATES, shared_replay=SHARED_REPLAY):
+    """
+    Start n_actors actor processes and train a DQNAgent on what they send.
+
+    Args:
+        n_actors: number of actor processes.
+        epsilons: per-actor exploration rates, defaults to actor_epsilons(n_actors).
+        sync_interval: learner updates between weight publications to the actors.
+        n_updates: learner updates before shutting down.
+        shared_replay: let actors write into a SharedReplayBuffer instead of sending transitions to the learner.
+
+    Returns:
+        The trained DQNAgent. With shared_replay its memory is a plain ReplayBuffer copy of the
+        shared one, whose blocks are freed on the way out.
+    """
+    epsilons = actor_epsilons(n_actors) if epsilons is None else epsilons
+    assert len(epsilons) == n_actors, "Need one epsilon per actor."
+
+    ctx = mp.get_context("spawn")
+    memory = SharedReplayBuffer(MEM_SIZE, INPUT_DIMS, N_ACTIONS, lock=ctx.Lock()) if shared_replay else None
+    replay = (memory.name, MEM_SIZE, memory.lock) if shared_replay else None
+
+    agent = DQNAgent(alpha=0.0005, gamma=0.99, n_actions=N_ACTIONS, epsilon=0.0, epsilon_end=0.0,
+                     replace_target=REPLACE_TARGET, batch_size=512, input_dims=INPUT_DIMS, mem_size=MEM_SIZE,
+                     memory=memory)
+
+    shared_net = DQNetwork(INPUT_DIMS, N_ACTIONS)
+    shared_net.share_memory()
+    version = ctx.Value("i", 0)
+    lock = ctx.Lock()
+    transitions = ctx.Queue(maxsize=1000)
+    stop = ctx.Event()
+    publish(agent, shared_net, version, lock)
+
+    actors = [ctx.Process(target=actor, args=(i, epsilons[i], shared_net, version, lock, transitions, stop, replay),
+                          daemon=True)
+              for i in range(n_actors)]
+    for process in actors:
+        process.start()
+
+    scores = []
+    try:
+        while agent.learn_step_counter < n_updates:
+            # Actors only return once stop is set, so any that exited has failed
+            dead = [i for i, process in enumerate(actors) if not process.is_alive()]
+            if dead:
+                raise RuntimeError(f"Actor(s) {dead} exited with code(s) {[actors[i].exitcode for i in dead]}")
+
+            # Drain whatever the actors have sent, then do one gradient step
+            while True:
+                try:
+                    message = transitions.get(block=agent.memory.mem_cntr < agent.batch_size, timeout=1)
+                except queue.Empty:
+                    break
+                if message[0] == "episode":
+                    _, actor_id, score = message
+                    scores.append(score)
+                    print('actor: ', actor_id, 'score: %.2f' % score,
+                          ' average score %.2f' % np.mean(scores[-100:]),
+                          ' memory size', agent.memory.mem_cntr)
+                else:
+                    agent.memory.store_batch(*message[1:])
+
+            steps = agent.learn_step_counter
+            agent.learn()
+            if agent.learn_step_counter != steps:
+                if agent.learn_step_counter % sync_interval == 0:
+                    publish(agent, shared_net, version, lock)
+                if agent.learn_step_counter % SAVE_INTERVAL == 0:
+                    agent.save_model("model_weights")
+                    print("save model")
+    finally:
+        stop.set()
+        # Unblock actors stuck on a full queue so they can see the stop flag
+        while any(process.is_alive() for process in actors):
+            try:
+                transitions.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in actors:
+            process.join()
+        if memory is not None:
+            agent.memory = ReplayBuffer(MEM_SIZE, INPUT_DIMS, N_ACTIONS)
+            agent.memory.load_state_dict(memory.state_dict())
+            memory.close()
+            memory.unlink()
+
+    agent.save_model("model_weights")
+    return agent
+
+
+if __name__ == "__main__":
+    run()
@@ -2,11 +2,52 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import numpy as np
+import os
+import copy
+import json
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+
+# Preallocated training batch
+class ReplayBatch:
+    """
+    Reusable batch arrays for ReplayBuffer.sample_into, each wrapped once with torch.from_numpy
+    so the tensors share memory with the arrays and a training step allocates nothing.
+    """
+
+    def __init__(self, batch_size, input_shape):
+        self.batch_size = batch_size
+        self.indices = np.zeros(batch_size, dtype=np.int64)
+        self.states = np.zeros((batch_size, input_shape), dtype=np.float32)
+        self.actions = np.zeros(batch_size, dtype=np.int64)
+        self.rewards = np.zeros(batch_size, dtype=np.float32)
+        self.states_ = np.zeros((batch_size, input_shape), dtype=np.float32)
+        self.terminal = np.zeros(batch_size, dtype=np.float32)
+        self.weights = np.ones(batch_size, dtype=np.float32)
+        self.horizons = np.ones(batch_size, dtype=np.float32)
+
+        self.t_states = torch.from_numpy(self.states)
+        self.t_actions = torch.from_numpy(self.actions)
+        self.t_rewards = torch.from_numpy(self.rewards)
+        self.t_states_ = torch.from_numpy(self.states_)
+        self.t_terminal = torch.from_numpy(self.terminal)
+        self.t_weights = torch.from_numpy(self.weights)
+        self.t_horizons = torch.from_numpy(self.horizons)
 
 
 # Replay Buffer
 class ReplayBuffer:
-    def __init__(self, max_size, input_shape, n_actions):
+    # sample_into returns n_step returns when n_step > 1, see set_n_step
+    n_step = 1
+    gamma = 0.99
+    # Arrays saved by state_dict
+    columns = ("state_memory", "new_state_memory", "action_memory", "reward_memory", "terminal_memory")
+
+    def __init__(self, max_size, input_shape, n_actions, n_step=1, gamma=0.99):
+        self.n_step = n_step
+        self.gamma = gamma
         self.mem_size = max_size
         self.mem_cntr = 0
         self.state_memory = np.zeros((self.mem_size, input_shape), dtype=np.float32)
@@ -15,14 +56,28 @@ class ReplayBuffer:
         self.reward_memory = np.zeros(self.mem_size, dtype=np.float32)
         self.terminal_memory = np.zeros(self.mem_size, dtype=np.float32)
 
+    def _claim(self, n):
+        # Reserve n consecutive slots, returns the counter value of the first one
+        start = self.mem_cntr
+        self.mem_cntr += n
+        return start
+
     def store_transition(self, state, action, reward, state_, done):
-        index = self.mem_cntr % self.mem_size
+        index = self._claim(1) % self.mem_size
         self.state_memory[index] = state
         self.new_state_memory[index] = state_
         self.action_memory[index] = action
         self.reward_memory[index] = reward
         self.terminal_memory[index] = 1 - int(done)
-        self.mem_cntr += 1
+
+    def store_batch(self, states, actions, rewards, states_, dones):
+        """Store a block of transitions with one vectorized write per column."""
+        index = (self._claim(len(actions)) + np.arange(len(actions))) % self.mem_size
+        self.state_memory[index] = states
+        self.new_state_memory[index] = states_
+        self.action_memory[index] = actions
+        self.reward_memory[index] = rewards
+        self.terminal_memory[index] = 1 - np.asarray(dones, dtype=np.float32)
 
     def sample_buffer(self, batch_size):
         max_mem = min(self.mem_cntr, self.mem_size)
@@ -36,6 +91,473 @@ class ReplayBuffer:
 
         return states, actions, rewards, states_, terminal
 
+    def sample_indices(self, batch):
+        # Uniform with replacement: O(1) per sample, unlike np.random.choice(replace=False)
+        max_mem = min(self.mem_cntr, self.mem_size)
+        batch.indices[:] = np.random.randint(0, max_mem, batch.batch_size)
+
+    def sample_into(self, batch):
+        """Sample batch.batch_size transitions straight into the preallocated ReplayBatch arrays."""
+        self.sample_indices(batch)
+        np.take(self.state_memory, batch.indices, axis=0, out=batch.states, mode="clip")
+        np.take(self.action_memory, batch.indices, out=batch.actions, mode="clip")
+        if self.n_step > 1:
+            batch.rewards[:], last, batch.horizons[:] = self.n_step_returns(batch.indices)
+        else:
+            np.take(self.reward_memory, batch.indices, out=batch.rewards, mode="clip")
+            last = batch.indices
+        np.take(self.new_state_memory, last, axis=0, out=batch.states_, mode="clip")
+        np.take(self.terminal_memory, last, out=batch.terminal, mode="clip")
+        return batch
+
+    def state_dict(self):
+        """Copies of the stored transitions and the counter, e.g. for checkpointing."""
+        filled = min(self.mem_cntr, self.mem_size)
+        state = {column: np.array(getattr(self, column)[:filled]) for column in self.columns}
+        state["mem_cntr"] = self.mem_cntr
+        return state
+
+    def load_state_dict(self, state):
+        for column in self.columns:
+            values = state[column]
+            if len(values) > self.mem_size:
+                raise ValueError(f"Saved buffer holds {len(values)} transitions, this one only fits {self.mem_size}")
+            getattr(self, column)[:len(values)] = values
+        self.mem_cntr = state["mem_cntr"]
+
+    def set_n_step(self, n_step, gamma):
+        self.n_step = n_step
+        self.gamma = gamma
+
+    def continues(self, indices):
+        """True where the slot after indices holds the next step of the same episode."""
+        newest = (self.mem_cntr - 1) % self.mem_size
+        following = (indices + 1) % self.mem_size
+        # Several writers (SharedReplayBuffer) may interleave episodes, so check the states line up
+        return ((self.terminal_memory[indices] > 0) & (indices != newest)
+                & (self.new_state_memory[indices] == self.state_memory[following]).all(axis=-1))
+
+    def n_step_returns(self, indices):
+        """
+        Discounted sums of up to n_step rewards starting at indices, cut at the end of the episode
+        or at the newest stored transition.
+
+        Returns:
+            returns: (B,) sum of gamma ** k * r_{t+k}.
+            last: (B,) slot of the last summed transition, its next state is the one to bootstrap from.
+            horizons: (B,) number of rewards summed, the bootstrap term is discounted by gamma ** horizons.
+        """
+        steps = (indices[:, None] + np.arange(self.n_step)) % self.mem_size
+        alive = np.ones(steps.shape, dtype=np.bool_)
+        alive[:, 1:] = np.logical_and.accumulate(self.continues(steps[:, :-1]), axis=1)
+
+        discounts = self.gamma ** np.arange(self.n_step, dtype=np.float32)
+        returns = (self.reward_memory[steps] * alive) @ discounts
+        horizons = alive.sum(axis=1)
+        last = steps[np.arange(len(indices)), horizons - 1]
+        return returns, last, horizons
+
+
+# Replay Buffer in shared memory, writable from several processes
+class SharedReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer whose five columns and counter live in multiprocessing.shared_memory blocks.
+
+    The creating process owns the blocks; other processes attach to them by name and write
+    directly into the same memory. Writers claim slots and write them under lock, and the
+    learner samples under it too, so a sample never sees a claimed but unwritten (or half
+    overwritten) slot; pass the creator's lock to every process that attaches. Sampling gathers
+    straight from the shared arrays, nothing is pickled.
+    """
+
+    def __init__(self, max_size, input_shape, n_actions, name=None, create=True, lock=None):
+        self.mem_size = max_size
+        self.lock = lock if lock is not None else multiprocessing.Lock()
+        self._blocks = []
+
+        columns = [
+            ("state_memory", (max_size, input_shape), np.float32),
+            ("new_state_memory", (max_size, input_shape), np.float32),
+            ("action_memory", (max_size,), np.int64),
+            ("reward_memory", (max_size,), np.float32),
+            ("terminal_memory", (max_size,), np.float32),
+            ("_counter", (1,), np.int64),
+        ]
+        if create:
+            self.name = name or f"replay_{np.random.randint(1 << 30):x}"
+        else:
+            self.name = name
+
+        for column, shape, dtype in columns:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            block = shared_memory.SharedMemory(name=f"{self.name}_{column}", create=create, size=size if create else 0)
+            if not create and multiprocessing.parent_process() is None:
+                # A process outside the creator's tree has its own resource tracker, which would
+                # unlink the creator's blocks when this process exits
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(block._name, "shared_memory")
+            self._blocks.append(block)
+            array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if create:
+                array[:] = 0
+            setattr(self, column, array)
+
+    @classmethod
+    def attach(cls, name, max_size, input_shape, n_actions, lock):
+        return cls(max_size, input_shape, n_actions, name=name, create=False, lock=lock)
+
+    @property
+    def mem_cntr(self):
+        return int(self._counter[0])
+
+    @mem_cntr.setter
+    def mem_cntr(self, value):
+        self._counter[0] = value
+
+    def _claim(self, n):
+        # Only called by store_transition / store_batch, which already hold self.lock
+        start = int(self._counter[0])
+        self._counter[0] = start + n
+        return start
+
+    def store_transition(self, state, action, reward, state_, done):
+        with self.lock:
+            super(SharedReplayBuffer, self).store_transition(state, action, reward, state_, done)
+
+    def store_batch(self, states, actions, rewards, states_, dones):
+        with self.lock:
+            super(SharedReplayBuffer, self).store_batch(states, actions, rewards, states_, dones)
+
+    def sample_buffer(self, batch_size):
+        with self.lock:
+            return super(SharedReplayBuffer, self).sample_buffer(batch_size)
+
+    def sample_into(self, batch):
+        with self.lock:
+            return super(SharedReplayBuffer, self).sample_into(batch)
+
+    def close(self):
+        for column in ("state_memory", "new_state_memory", "action_memory", "reward_memory", "terminal_memory", "_counter"):
+            setattr(self, column, None)
+        for block in self._blocks:
+            block.close()
+
+    def unlink(self):
+        # Only the creating process should call this, after every process has closed
+        for block in self._blocks:
+            block.unlink()
+
+
+# Replay Buffer on disk
+class MemmapReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer whose columns are memory-mapped .npy files in directory, plus a small
+    header.json holding mem_cntr. Capacity is bounded by disk, not RAM, and opening an
+    existing directory picks up where the last run stopped. Call flush() (e.g. once per
+    episode) to persist the counter; transitions stored after the last flush are ignored
+    on reopen.
+    """
+
+    def __init__(self, directory, max_size, input_shape, n_actions):
+        self.directory = directory
+        self.mem_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+        header_path = os.path.join(directory, "header.json")
+        if os.path.exists(header_path):
+            with open(header_path) as file:
+                header = json.load(file)
+            if (header["mem_size"], header["input_shape"]) != (max_size, input_shape):
+                raise ValueError(f"{directory} holds a buffer of size {header['mem_size']} "
+                                 f"with {header['input_shape']} inputs")
+            mode, self.mem_cntr = "r+", header["mem_cntr"]
+        else:
+            mode, self.mem_cntr = "w+", 0
+        self.input_shape = input_shape
+
+        columns = [
+            ("state_memory", (max_size, input_shape), np.float32),
+            ("new_state_memory", (max_size, input_shape), np.float32),
+            ("action_memory", (max_size,), np.int64),
+            ("reward_memory", (max_size,), np.float32),
+            ("terminal_memory", (max_size,), np.float32),
+        ]
+        for column, shape, dtype in columns:
+            path = os.path.join(directory, column + ".npy")
+            setattr(self, column, np.lib.format.open_memmap(path, mode=mode, dtype=dtype, shape=shape))
+
+        if mode == "w+":
+            self.flush()
+
+    def flush(self):
+        for column in ("state_memory", "new_state_memory", "action_memory", "reward_memory", "terminal_memory"):
+            getattr(self, column).flush()
+
+        # Write the header last, through a temp file, so it never points past flushed data
+        header_path = os.path.join(self.directory, "header.json")
+        with open(header_path + ".tmp", "w") as file:
+            json.dump({"mem_size": self.mem_size, "input_shape": self.input_shape, "mem_cntr": self.mem_cntr}, file)
+        os.replace(header_path + ".tmp", header_path)
+
+    def state_dict(self):
+        """The transitions already live in directory: flush them and record only where they are."""
+        self.flush()
+        return {"directory": os.path.abspath(self.directory), "mem_cntr": self.mem_cntr}
+
+    def load_state_dict(self, state):
+        if os.path.abspath(state["directory"]) != os.path.abspath(self.directory):
+            raise ValueError(f"Checkpoint refers to the buffer in {state['directory']}, not {self.directory}")
+        self.mem_cntr = state["mem_cntr"]
+        self.flush()
+
+
+# Compact Replay Buffer
+class CompactReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer that stores every observation once. The next state of transition t is the
+    state of transition t+1 unless t ended its episode; episode starts are detected when a
+    transition's state differs from the previous transition's state_ (or the previous one was
+    done). Transitions whose next frame is not available (the newest one, or the last one of a
+    truncated episode) are never sampled.
+
+    obs_dtype picks the frame encoding: float32, float16, or uint8 linearly quantized between
+    obs_low and obs_high (scalars or per-feature arrays). With uint8 frames a transition costs
+    26 bytes for 19 inputs instead of 168.
+    """
+
+    columns = ("frame_memory", "action_memory", "reward_memory", "done_memory", "start_memory")
+
+    def __init__(self, max_size, input_shape, n_actions, obs_dtype=np.uint8, obs_low=-1.0, obs_high=1.0):
+        self.mem_size = max_size
+        self.mem_cntr = 0
+        self.obs_dtype = np.dtype(obs_dtype)
+        self.frame_memory = np.zeros((self.mem_size, input_shape), dtype=self.obs_dtype)
+        self.action_memory = np.zeros(self.mem_size, dtype=np.uint8 if n_actions <= 256 else np.int64)
+        self.reward_memory = np.zeros(self.mem_size, dtype=np.float32)
+        self.done_memory = np.zeros(self.mem_size, dtype=np.bool_)
+        self.start_memory = np.zeros(self.mem_size, dtype=np.bool_)
+
+        if self.obs_dtype == np.uint8:
+            self.obs_low = np.broadcast_to(np.asarray(obs_low, dtype=np.float32), (input_shape,))
+            self.obs_scale = (np.broadcast_to(np.asarray(obs_high, dtype=np.float32), (input_shape,)) - self.obs_low) / 255
+
+        # state_ of the newest transition, to tell whether the next one continues its episode
+        self.last_state_ = None
+        self.last_done = True
+
+    def state_dict(self):
+        state = super(CompactReplayBuffer, self).state_dict()
+        state["last_state_"] = self.last_state_
+        state["last_done"] = self.last_done
+        return state
+
+    def load_state_dict(self, state):
+        super(CompactReplayBuffer, self).load_state_dict(state)
+        self.last_state_ = state["last_state_"]
+        self.last_done = state["last_done"]
+
+    def encode(self, states):
+        states = np.asarray(states, dtype=np.float32)
+        if self.obs_dtype == np.uint8:
+            return np.clip(np.rint((states - self.obs_low) / self.obs_scale), 0, 255)
+        return states
+
+    def decode(self, frames, out=None):
+        if self.obs_dtype == np.uint8:
+            out = np.multiply(frames, self.obs_scale, out=out, dtype=np.float32)
+            out += self.obs_low
+            return out
+        if out is None:
+            return frames.astype(np.float32)
+        out[:] = frames
+        return out
+
+    def store_transition(self, state, action, reward, state_, done):
+        start = self.last_done or not np.array_equal(state, self.last_state_)
+        index = self._claim(1) % self.mem_size
+        self.frame_memory[index] = self.encode(state)
+        self.action_memory[index] = action
+        self.reward_memory[index] = reward
+        self.done_memory[index] = done
+        self.start_memory[index] = start
+
+        self.last_done = bool(done)
+        self.last_state_ = None if done else np.array(state_)
+
+    def store_batch(self, states, actions, rewards, states_, dones):
+        states, states_ = np.asarray(states), np.asarray(states_)
+        dones = np.asarray(dones, dtype=np.bool_)
+        n = len(actions)
+
+        starts = np.empty(n, dtype=np.bool_)
+        starts[0] = self.last_done or not np.array_equal(states[0], self.last_state_)
+        starts[1:] = dones[:-1] | (states[1:] != states_[:-1]).any(axis=1)
+
+        index = (self._claim(n) + np.arange(n)) % self.mem_size
+        self.frame_memory[index] = self.encode(states)
+        self.action_memory[index] = actions
+        self.reward_memory[index] = rewards
+        self.done_memory[index] = dones
+        self.start_memory[index] = starts
+
+        self.last_done = bool(dones[-1])
+        self.last_state_ = None if self.last_done else np.array(states_[-1])
+
+    def _linked(self, indices):
+        newest = (self.mem_cntr - 1) % self.mem_size
+        following = (indices + 1) % self.mem_size
+        return ~self.done_memory[indices] & (indices != newest) & ~self.start_memory[following]
+
+    def valid(self, indices):
+        """Transitions whose next state is known: terminal ones, or ones followed by their successor."""
+        return self.done_memory[indices] | self._linked(indices)
+
+    def continues(self, indices):
+        # The next step must itself have a next state, or an n-step return could end on a missing frame
+        return self._linked(indices) & self.valid((indices + 1) % self.mem_size)
+
+    def sample_indices(self, batch):
+        max_mem = min(self.mem_cntr, self.mem_size)
+        indices = np.random.randint(0, max_mem, batch.batch_size)
+        invalid = ~self.valid(indices)
+        # Redraw the few samples that have no next state
+        while invalid.any():
+            indices[invalid] = np.random.randint(0, max_mem, invalid.sum())
+            invalid[invalid] = ~self.valid(indices[invalid])
+        batch.indices[:] = indices
+
+    def sample_into(self, batch):
+        self.sample_indices(batch)
+        if self.n_step > 1:
+            batch.rewards[:], last, batch.horizons[:] = self.n_step_returns(batch.indices)
+        else:
+            batch.rewards[:] = self.reward_memory[batch.indices]
+            last = batch.indices
+        self.decode(self.frame_memory[batch.indices], out=batch.states)
+        self.decode(self.frame_memory[(last + 1) % self.mem_size], out=batch.states_)
+        batch.actions[:] = self.action_memory[batch.indices]
+        batch.terminal[:] = ~self.done_memory[last]
+        return batch
+
+    def sample_buffer(self, batch_size):
+        batch = self.sample_into(ReplayBatch(batch_size, self.frame_memory.shape[1]))
+        return batch.states, batch.actions, batch.rewards, batch.states_, batch.terminal
+
+
+# Sum-tree over replay priorities
+class SumTree:
+    """
+    Binary sum-tree stored in one flat array: tree[1] is the root, the children of node i are
+    2i and 2i+1 and the leaves start at tree[size]. Updates and lookups walk one level at a
+    time for a whole batch of indices, so both are O(log N) NumPy ops per batch.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # Pad the leaf count to a power of two so every leaf sits at the same depth
+        self.size = 1 << max(capacity - 1, 1).bit_length()
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[indices + self.size]
+
+    def update(self, indices, priorities):
+        nodes = np.asarray(indices) + self.size
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        """Leaf index for each value in [0, total): the leaf whose prefix-sum interval contains it."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            right = values > self.tree[left]
+            values -= self.tree[left] * right
+            nodes = left + right
+        return nodes - self.size
+
+
+# Prioritized Replay Buffer
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer that samples transitions in proportion to priority ** alpha and returns
+    importance-sampling weights (annealed from beta towards 1) to correct for the bias.
+    New transitions get the highest priority seen so far, so they are replayed at least once.
+    """
+
+    def __init__(self, max_size, input_shape, n_actions, alpha=0.6, beta=0.4, beta_increment=1e-5, epsilon=1e-6,
+                 n_step=1, gamma=0.99):
+        super(PrioritizedReplayBuffer, self).__init__(max_size, input_shape, n_actions, n_step, gamma)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.tree = SumTree(max_size)
+
+    def store_transition(self, state, action, reward, state_, done):
+        index = self.mem_cntr % self.mem_size
+        super(PrioritizedReplayBuffer, self).store_transition(state, action, reward, state_, done)
+        self.tree.update([index], self.max_priority ** self.alpha)
+
+    def store_batch(self, states, actions, rewards, states_, dones):
+        index = (self.mem_cntr + np.arange(len(actions))) % self.mem_size
+        super(PrioritizedReplayBuffer, self).store_batch(states, actions, rewards, states_, dones)
+        self.tree.update(index, self.max_priority ** self.alpha)
+
+    def _sample(self, batch_size):
+        max_mem = min(self.mem_cntr, self.mem_size)
+
+        # One uniform draw per equal slice of the total priority mass
+        segment = self.tree.total / batch_size
+        values = (np.arange(batch_size) + np.random.random(batch_size)) * segment
+        batch = np.minimum(self.tree.find(values), max_mem - 1)
+
+        probs = self.tree.get(batch) / self.tree.total
+        weights = (max_mem * probs) ** -self.beta
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        return batch, weights / weights.max()
+
+    def sample_buffer(self, batch_size):
+        batch, weights = self._sample(batch_size)
+
+        states = self.state_memory[batch]
+        actions = self.action_memory[batch]
+        rewards = self.reward_memory[batch]
+        states_ = self.new_state_memory[batch]
+        terminal = self.terminal_memory[batch]
+
+        return states, actions, rewards, states_, terminal, batch, weights.astype(np.float32)
+
+    def sample_indices(self, batch):
+        batch.indices[:], batch.weights[:] = self._sample(batch.batch_size)
+
+    def state_dict(self):
+        state = super(PrioritizedReplayBuffer, self).state_dict()
+        state["tree"] = self.tree.tree.copy()
+        state["max_priority"] = self.max_priority
+        state["beta"] = self.beta
+        return state
+
+    def load_state_dict(self, state):
+        super(PrioritizedReplayBuffer, self).load_state_dict(state)
+        self.tree.tree[:] = state["tree"]
+        self.max_priority = state["max_priority"]
+        self.beta = state["beta"]
+
+    def update_priorities(self, batch, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update(batch, priorities ** self.alpha)
+
 
 # Deep Q-Network
 class DQNetwork(nn.Module):
@@ -52,10 +574,58 @@ class DQNetwork(nn.Module):
         return actions
 
 
+def td_loss(q_values, actions, rewards, q_next, terminal, discounts, weights):
+    """
+    Weighted mean squared TD error of the taken actions, plus the TD errors themselves.
+
+    q_next are the target network's outputs for the next states (computed without grad);
+    terminal is 0 for transitions that must not bootstrap, discounts is gamma ** horizon.
+    """
+    q_pred = q_values.gather(1, actions.unsqueeze(1)).squeeze(1)
+    # Terminal transitions may have no next state stored (NaN), never bootstrap from them
+    q_next = torch.where(terminal > 0, q_next.max(dim=1)[0], torch.zeros_like(rewards))
+    q_target = rewards + discounts * q_next * terminal
+    td_errors = q_target - q_pred
+    return (weights * td_errors ** 2).mean(), td_errors
+
+
+# NumPy forward pass for acting
+class NumpyPolicy:
+    """
+    DQNetwork forward pass in plain NumPy, for picking actions without torch dispatch or autograd.
+
+    The weight matrices are NumPy views of the network's parameter tensors, not copies, so
+    optimizer steps and load_state_dict (both in place) are picked up with no refresh.
+    q_values takes one observation (19,) or a batch (N, 19).
+    """
+
+    def __init__(self, net):
+        self.layers = [(layer.weight.detach().numpy().T, layer.bias.detach().numpy())
+                       for layer in (net.fc1, net.fc2, net.fc3)]
+
+    def q_values(self, states):
+        x = np.asarray(states, dtype=np.float32)
+        (w1, b1), (w2, b2), (w3, b3) = self.layers
+        x = x @ w1
+        x += b1
+        np.maximum(x, 0, out=x)
+        x = x @ w2
+        x += b2
+        np.maximum(x, 0, out=x)
+        x = x @ w3
+        x += b3
+        return x
+
+    def act(self, states):
+        return np.argmax(self.q_values(states), axis=-1)
+
+
 # DQN Agent
 class DQNAgent:
     def __init__(self, alpha, gamma, n_actions, epsilon, batch_size, input_dims,
-                 epsilon_dec=0.996, epsilon_end=0.01, mem_size=10000, replace_target=1000):
+                 epsilon_dec=0.996, epsilon_end=0.01, mem_size=10000, replace_target=1000, memory=None,
+                 prioritized=False, priority_alpha=0.6, priority_beta=0.4, n_step=1, compile_learn=None,
+                 num_threads=None):
         self.gamma = gamma
         self.epsilon = epsilon
         self.epsilon_min = epsilon_end
@@ -67,27 +637,69 @@ class DQNAgent:
         self.action_space = [i for i in range(n_actions)]
         self.learn_step_counter = 0
 
-        self.memory = ReplayBuffer(mem_size, input_dims, n_actions)
+        if memory is None:
+            if prioritized:
+                memory = PrioritizedReplayBuffer(mem_size, input_dims, n_actions, priority_alpha, priority_beta)
+            else:
+                memory = ReplayBuffer(mem_size, input_dims, n_actions)
+        if n_step > 1:
+            memory.set_n_step(n_step, gamma)
+        self.memory = memory
+        self.prioritized = isinstance(memory, PrioritizedReplayBuffer)
+        self.batch = ReplayBatch(batch_size, input_dims)
 
         self.q_eval = DQNetwork(input_dims, n_actions)
         self.q_next = DQNetwork(input_dims, n_actions)
 
         self.optimizer = optim.Adam(self.q_eval.parameters(), lr=self.lr)
-        self.loss = nn.MSELoss()
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        # compile_learn: None for eager, "script" for a TorchScript td_loss,
+        # "compile" to torch.compile the whole forward + loss (falls back to eager if it fails)
+        self.compile_learn = compile_learn
+        self.td_loss = td_loss
+        self.loss_step = self._loss_step
+        if compile_learn == "script":
+            self.td_loss = torch.jit.script(td_loss)
+        elif compile_learn == "compile":
+            self.loss_step = torch.compile(self._loss_step)
+        elif compile_learn is not None:
+            raise ValueError(f"Unknown compile_learn mode {compile_learn!r}")
 
         self.q_next.load_state_dict(self.q_eval.state_dict())
         self.q_next.eval()
 
+        # Network choose_action uses; q_eval itself unless a LearnerThread publishes snapshots
+        self.q_act = self.q_eval
+        self.policy = NumpyPolicy(self.q_act)
+        # Guards the replay buffer when a LearnerThread samples while another thread stores
+        self.memory_lock = threading.Lock()
+
     def remember(self, state, action, reward, new_state, done):
-        self.memory.store_transition(state, action, reward, new_state, done)
+        with self.memory_lock:
+            self.memory.store_transition(state, action, reward, new_state, done)
 
     def choose_action(self, state):
         if np.random.random() < self.epsilon:
             return np.random.choice(self.action_space)
         else:
-            state = torch.tensor(state, dtype=torch.float32)
-            actions = self.q_eval(state)
-            return torch.argmax(actions).item()
+            return int(self.policy.act(state))
+
+    def choose_actions(self, states):
+        """Epsilon-greedy actions for a batch of observations (N, input_dims)."""
+        actions = self.policy.act(states)
+        explore = np.random.random(len(actions)) < self.epsilon
+        actions[explore] = np.random.randint(0, self.n_actions, explore.sum())
+        return actions
+
+    def publish_policy(self):
+        # Swap in a frozen copy of q_eval; rebinding the attribute is atomic, so the acting thread needs no lock
+        q_act = copy.deepcopy(self.q_eval)
+        q_act.requires_grad_(False)
+        self.q_act = q_act
+        self.policy = NumpyPolicy(q_act)
 
     def learn(self):
         if self.memory.mem_cntr < self.batch_size:
@@ -95,21 +707,24 @@ class DQNAgent:
 
         self.optimizer.zero_grad()
 
-        states, actions, rewards, states_, terminal = self.memory.sample_buffer(self.batch_size)
-
-        states = torch.tensor(states, dtype=torch.float32)
-        actions = torch.tensor(actions, dtype=torch.long)
-        rewards = torch.tensor(rewards, dtype=torch.float32)
-        states_ = torch.tensor(states_, dtype=torch.float32)
-        terminal = torch.tensor(terminal, dtype=torch.float32)
-
-        indices = np.arange(self.batch_size)
+        # Sampled in place into the reusable batch tensors
+        with self.memory_lock:
+            batch = self.memory.sample_into(self.batch)
 
-        q_pred = self.q_eval(states)[indices, actions]
-        q_next = self.q_next(states_).max(dim=1)[0]
-        q_target = rewards + self.gamma * q_next * terminal
+        args = (batch.t_states, batch.t_actions, batch.t_rewards, batch.t_states_, batch.t_terminal,
+                batch.t_horizons, batch.t_weights)
+        try:
+            loss, td_errors = self.loss_step(*args)
+        except Exception as error:
+            if self.loss_step == self._loss_step:
+                raise
+            print("compiled learn step failed, falling back to eager:", error)
+            self.loss_step = self._loss_step
+            loss, td_errors = self.loss_step(*args)
 
-        loss = self.loss(q_pred, q_target)
+        if self.prioritized:
+            with self.memory_lock:
+                self.memory.update_priorities(batch.indices, td_errors.detach().numpy())
         loss.backward()
         self.optimizer.step()
 
@@ -120,9 +735,107 @@ class DQNAgent:
 
         self.epsilon = max(self.epsilon * self.epsilon_dec, self.epsilon_min)
 
+    def pretrain(self, n_steps):
+        # Learner-only updates on what is already in memory (e.g. demonstrations), epsilon is left as it was
+        epsilon = self.epsilon
+        for _ in range(n_steps):
+            self.learn()
+        self.epsilon = epsilon
+        if self.q_act is not self.q_eval:
+            self.publish_policy()
+
+    def _loss_step(self, states, actions, rewards, states_, terminal, horizons, weights):
+        # weights are all ones unless sampling is prioritized, horizons all ones unless n-step
+        with torch.no_grad():
+            q_next = self.q_next(states_)
+        return self.td_loss(self.q_eval(states), actions, rewards, q_next, terminal, self.gamma ** horizons, weights)
+
     def save_model(self, filename):
         torch.save(self.q_eval.state_dict(), filename)
 
+    def state_dict(self, include_memory=True):
+        """
+        Everything needed to resume training, as copies: later updates do not change the
+        returned dict, so it can be serialized on another thread.
+        """
+        state = {
+            "q_eval": {name: value.clone() for name, value in self.q_eval.state_dict().items()},
+            "q_next": {name: value.clone() for name, value in self.q_next.state_dict().items()},
+            "optimizer": copy.deepcopy(self.optimizer.state_dict()),
+            "epsilon": self.epsilon,
+            "learn_step_counter": self.learn_step_counter,
+        }
+        if include_memory:
+            with self.memory_lock:
+                state["memory"] = self.memory.state_dict()
+        return state
+
+    def load_state_dict(self, state):
+        self.q_eval.load_state_dict(state["q_eval"])
+        self.q_next.load_state_dict(state["q_next"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.epsilon = state["epsilon"]
+        self.learn_step_counter = state["learn_step_counter"]
+        if "memory" in state:
+            with self.memory_lock:
+                self.memory.load_state_dict(state["memory"])
+        if self.q_act is not self.q_eval:
+            self.publish_policy()
+
     def load_model(self, filename):
         self.q_eval.load_state_dict(torch.load(filename))
         self.q_next.load_state_dict(self.q_eval.state_dict())
+        if self.q_act is not self.q_eval:
+            self.publish_policy()
+
+
+# Background learner
+class LearnerThread(threading.Thread):
+    """
+    Runs agent.learn() on a background thread so the environment loop never waits on the optimizer.
+
+    The env thread keeps calling agent.remember and reports each step with add_steps(). The learner
+    does up to replay_ratio updates per reported env step (it falls behind, never ahead, when the
+    optimizer is the slower side) and every sync_interval updates publishes a snapshot of q_eval
+    into agent.q_act, the network choose_action uses.
+    """
+
+    def __init__(self, agent, replay_ratio=1.0, sync_interval=10):
+        super(LearnerThread, self).__init__(daemon=True)
+        self.agent = agent
+        self.replay_ratio = replay_ratio
+        self.sync_interval = sync_interval
+        self.env_steps = 0
+        self.updates = 0
+        # Held for the length of one update, take it to read or save q_eval consistently
+        self.update_lock = threading.Lock()
+        self.data_ready = threading.Event()
+        self.stopped = threading.Event()
+        agent.publish_policy()
+
+    def add_steps(self, n=1):
+        self.env_steps += n
+        self.data_ready.set()
+
+    def run(self):
+        agent = self.agent
+        while not self.stopped.is_set():
+            if agent.memory.mem_cntr < agent.batch_size or self.updates >= self.replay_ratio * self.env_steps:
+                self.data_ready.wait(0.1)
+                self.data_ready.clear()
+                continue
+
+            with self.update_lock:
+                agent.learn()
+            self.updates += 1
+            if self.updates % self.sync_interval == 0:
+                agent.publish_policy()
+
+    def save_model(self, filename):
+        with self.update_lock:
+            self.agent.save_model(filename)
+
+    def stop(self):
+        self.stopped.set()
+        self.data_ready.set()
+        self.join()
@@ -1,37 +1,51 @@
-import pygame
 import math
+import numpy as np
 from walls import Wall, getWalls
-from goals import Goal, getGoals
-from utils import Point, Line, Ray, distance, rotate, rotate_rect
+from goals import Goal, getGoalTracker
+from utils import Point, Line, distance, rotate, rotate_rect
+from spatial import WallGrid
+from collision import WallCollider
+from sdf import SignedDistanceField
+from sprites import CAR_SPRITES
+from headings import heading_index, heading_table
+from raycast import RAY_ANGLES, RAY_CENTER, RAY_LENGTH, pack_segments, ray_directions, cast_rays
+from profiling import NULL_TIMER
 
 GOALREWARD = 10
 LIFE_REWARD = -5
 PENALTY = -10
 
 class Car:
-    def __init__(self, x, y):
+    def __init__(self, x, y, angle=math.radians(180)):
         self.position = Point(x, y)
         self.width = 14
         self.height = 30
         self.points = 0
 
-        # Load car image
-        self.original_image = pygame.image.load("assets/car.png").convert()
-        self.original_image.set_colorkey((0, 0, 0))
-        self.image = self.original_image
-        self.rect = self.image.get_rect(center=(x, y))
-
         # Motion parameters
-        self.angle = math.radians(180)
+        self.angle = angle
         self.target_angle = self.angle
         self.velocity = 0
         self.max_velocity = 15
         self.acceleration = 1
 
+        # Precomputed velocity, corner and ray vectors for the 24 quantized headings
+        self.headings = heading_table(self.width, self.height)
+
         # Define corners of the car
+        self.p1, self.p2, self.p3, self.p4 = Point(0, 0), Point(0, 0), Point(0, 0), Point(0, 0)
         self.update_corners()
 
     def update_corners(self):
+        k = heading_index(self.target_angle)
+        if k is not None:
+            # Move the existing corner points by the table offsets, no trig and no new Points
+            x, y = self.position.x, self.position.y
+            for pt, (dx, dy) in zip((self.p1, self.p2, self.p3, self.p4), self.headings.corners[k]):
+                pt.x = x + dx
+                pt.y = y + dy
+            return
+
         half_width, half_height = self.width / 2, self.height / 2
         self.pt1 = Point(self.position.x - half_width, self.position.y - half_height)
         self.pt2 = Point(self.position.x + half_width, self.position.y - half_height)
@@ -88,75 +102,56 @@ class Car:
         self.angle = self.target_angle
 
         # Calculate velocity vector and update position
-        velocity_vector = rotate(Point(0, 0), Point(0, self.velocity), self.angle)
-        self.position.x += velocity_vector.x
-        self.position.y += velocity_vector.y
-
-        self.rect.center = (self.position.x, self.position.y)
+        k = heading_index(self.angle)
+        if k is not None:
+            dx, dy = self.headings.velocity[k]
+            self.position.x += dx * self.velocity
+            self.position.y += dy * self.velocity
+        else:
+            velocity_vector = rotate(Point(0, 0), Point(0, self.velocity), self.angle)
+            self.position.x += velocity_vector.x
+            self.position.y += velocity_vector.y
 
         self.update_corners()
-        self.image = pygame.transform.rotate(self.original_image, 90 - math.degrees(self.angle))
-        self.rect = self.image.get_rect(center=self.rect.center)
 
 
-    def cast(self, walls):
+    def cast(self, walls, grid=None, sdf=None):
         """
         Cast rays from the car's position to detect distances to walls.
 
         Args:
-            walls: A list of wall objects to check for intersections.
+            walls: Packed (n, 4) wall array from raycast.pack_segments, or a list of wall objects.
+            grid: Optional spatial.WallGrid over the same walls, limits each ray to the walls in the cells it crosses.
+            sdf: Optional sdf.SignedDistanceField over the same walls, sphere-traces the rays instead of exact tests.
 
         Returns:
-            observations: A list of normalized distances from the car to the walls.
+            observations: An array of normalized distances from the car to the walls, followed by the velocity.
         """
-        # Define angles for the rays (relative to the car's target angle)
-        angles = [
-            0, -30, 30, -45, 45, -90, 90, 180,
-            10, -10, 135, -135, 20, -20, 90, -90, 0, 0
-        ]
-
-        # Define starting positions for the rays
-        positions = [self.position] * 14 + [self.p1, self.p2, self.p1, self.p2]
-
-        # Ensure angles and positions match in length
-        assert len(angles) == len(positions), "Mismatch between angles and positions."
+        k = heading_index(self.target_angle)
+        directions = self.headings.rays[k] if k is not None else ray_directions(self.target_angle + RAY_ANGLES)
 
-        # Generate rays
-        self.rays = [
-            Ray(positions[i], self.target_angle + math.radians(angles[i]))
-            for i in range(len(angles))
-        ]
-
-        # Initialize observations and closest rays
-        observations = []
-        self.closestRays = []
+        # 14 rays start at the car centre, the last four at the front corners
+        self.ray_origins = origins = np.empty((len(RAY_ANGLES), 2))
+        origins[:RAY_CENTER] = (self.position.x, self.position.y)
+        origins[RAY_CENTER:] = [(self.p1.x, self.p1.y), (self.p2.x, self.p2.y), (self.p1.x, self.p1.y), (self.p2.x, self.p2.y)]
 
-        # Cast each ray and record the closest intersection
-        for ray in self.rays:
-            closest = None
-            record = math.inf
-            for wall in walls:
-                pt = ray.cast(wall)
-                if pt:
-                    dist = distance(self.position, pt)
-                    if dist < record:
-                        record = dist
-                        closest = pt
+        if sdf is not None:
+            distances, self.closestRays = sdf.cast_rays(origins, directions, (self.position.x, self.position.y))
+        else:
+            distances, self.closestRays = cast_rays(origins, directions, pack_segments(walls),
+                                                    (self.position.x, self.position.y), grid)
 
-            if closest:
-                self.closestRays.append(closest)
-                observations.append(record)
-            else:
-                observations.append(1000)  # Default value if no intersection
+        # Normalize observations to range [0, 1] and append the normalized velocity
+        observations = np.empty(len(RAY_ANGLES) + 1)
+        observations[:-1] = (RAY_LENGTH - distances) / RAY_LENGTH
+        observations[-1] = self.velocity / self.max_velocity
 
-        # Normalize observations to range [0, 1]
-        normalized_observations = [(1000 - obs) / 1000 for obs in observations]
+        return observations
 
-        # Append velocity as a normalized value
-        normalized_observations.append(self.velocity / self.max_velocity)
-
-        return normalized_observations
 
+    def outline(self):
+        # The rotated corners as (x, y) pairs, in order around the car
+        return ((self.p1.x, self.p1.y), (self.p2.x, self.p2.y), (self.p3.x, self.p3.y), (self.p4.x, self.p4.y))
 
     def collision(self, wall):
         car_lines = [
@@ -186,7 +181,12 @@ class Car:
         return False
     
     def score(self, goal):
-        forward_vector = rotate(Point(0, 0), Point(0, -50), self.angle)
+        k = heading_index(self.angle)
+        if k is not None:
+            dx, dy = self.headings.velocity[k]
+            forward_vector = Point(-50 * dx, -50 * dy)
+        else:
+            forward_vector = rotate(Point(0, 0), Point(0, -50), self.angle)
         forward_line = Line(Point(self.position.x, self.position.y), Point(self.position.x + forward_vector.x, self.position.y + forward_vector.y))
 
         # Goal's endpoints
@@ -225,72 +225,106 @@ class Car:
         self.target_angle = self.angle
         self.points = 0
         self.update_corners()
-        self.rect = self.image.get_rect(center=(self.position.x, self.position.y))
 
     def draw(self, win):
-        win.blit(self.image, self.rect)
+        # The sprite is only rotated (or looked up) when a frame is drawn
+        image = CAR_SPRITES.get(self.angle)
+        win.blit(image, image.get_rect(center=(self.position.x, self.position.y)))
 
 
 class RacingEnv:
 
-    def __init__(self):
-        pygame.init()
-        self.font = pygame.font.Font(pygame.font.get_default_font(), 36)
-
+    def __init__(self, walls=None, headless=False, timer=None, track=None, sdf=False):
         self.fps = 120
         self.width = 1000
         self.height = 600
         self.history = []
 
-        self.screen = pygame.display.set_mode((self.width, self.height))
-        pygame.display.set_caption("RACING DQN")
-        self.screen.fill((0,0,0))
-        self.back_image = pygame.image.load("assets/track.png").convert()
-        self.back_rect = self.back_image.get_rect().move(0, 0)
+        # Headless envs never touch pygame until render() is called
+        self.headless = headless
+        self.screen = None
+        # profiling.PhaseTimer for the phases of step(); the default one is disabled
+        self.timer = NULL_TIMER if timer is None else timer
+        if not headless:
+            self.init_display()
+
         self.action_space = None
         self.observation_space = None
         self.game_reward = 0
         self.score = 0
+
+        if track is not None:
+            # A track_compiler.Track bundle: walls, goals, spawn and the spatial index come precomputed
+            self.walls = track.wall_objects()
+            self.wall_segments = track.walls
+            self.wall_grid = track.wall_grid()
+            self.collider = WallCollider(self.wall_segments, self.wall_grid, track.bounds)
+            self.goal_tracker = track.goal_tracker()
+            self.spawn = track.spawn
+        else:
+            # Track walls are static: pack them and build the spatial index once
+            self.walls = getWalls() if walls is None else walls
+            self.wall_segments = pack_segments(self.walls)
+            self.wall_grid = WallGrid(self.wall_segments)
+            self.collider = WallCollider(self.wall_segments, self.wall_grid)
+            # Only one goal is live at a time; the tracker is reset rather than rebuilt each episode
+            self.goal_tracker = getGoalTracker()
+            self.spawn = (50, 300, math.radians(180))
+        # Optional raster backend (see sdf.py): approximate collision and rays at a fixed cost per lookup
+        self.sdf = SignedDistanceField(self.wall_segments) if sdf else None
+        if self.sdf is not None:
+            self.collider = self.sdf
+        self.collided_wall = -1
+        self.goals = self.goal_tracker.goals
  
         self.reset()
 
 
+    def init_display(self):
+        import pygame
+        pygame.init()
+        self.font = pygame.font.Font(pygame.font.get_default_font(), 36)
+
+        self.screen = pygame.display.set_mode((self.width, self.height))
+        pygame.display.set_caption("RACING DQN")
+        self.screen.fill((0,0,0))
+        self.back_image = pygame.image.load("assets/track.png").convert()
+        self.back_rect = self.back_image.get_rect().move(0, 0)
+        CAR_SPRITES.load()
+
     def reset(self):
-        self.screen.fill((0, 0, 0))
+        if self.screen is not None:
+            self.screen.fill((0, 0, 0))
 
-        self.car = Car(50, 300)
-        self.walls = getWalls()
-        self.goals = getGoals()
+        self.car = Car(*self.spawn)
+        self.goal_tracker.reset()
+        self.collided_wall = -1
         self.game_reward = 0
 
     def step(self, action):
 
+        timer = self.timer
         done = False
-        self.car.action(action)
-        self.car.update()
+        with timer.phase("physics"):
+            self.car.action(action)
+            self.car.update()
         reward = LIFE_REWARD
 
-        # Check if car passes Goal and scores
-        index = 1
-        for goal in self.goals:
-            
-            if index > len(self.goals):
-                index = 1
-            if goal.isactiv:
-                if self.car.score(goal):
-                    goal.isactiv = False
-                    self.goals[index-2].isactiv = True
-                    reward += GOALREWARD
-
-            index = index + 1
-
-        # Check if car crashed in the wall
-        for wall in self.walls:
-            if self.car.collision(wall):
-                reward += PENALTY
-                done = True
-
-        new_state = self.car.cast(self.walls)
+        # Check if car passes the active Goal and scores
+        with timer.phase("goals"):
+            if self.car.score(self.goal_tracker.active):
+                self.goal_tracker.advance()
+                reward += GOALREWARD
+
+        # Check if car crashed in the wall (collided_wall is kept for debugging)
+        with timer.phase("collision"):
+            self.collided_wall = self.collider.first_hit(self.car.outline())
+        if self.collided_wall >= 0:
+            reward += PENALTY
+            done = True
+
+        with timer.phase("cast"):
+            new_state = self.car.cast(self.wall_segments, self.wall_grid, self.sdf)
         # Normalize states
         if done:
             new_state = None
@@ -298,6 +332,9 @@ class RacingEnv:
         return new_state, reward, done
 
     def render(self, action):
+        import pygame
+        if self.screen is None:
+            self.init_display()
 
         DRAW_WALLS = False
         DRAW_GOALS = True
@@ -323,18 +360,11 @@ class RacingEnv:
         self.car.draw(self.screen)
 
         if DRAW_RAYS:
-            i = 0
-            for pt in self.car.closestRays:
-                pygame.draw.circle(self.screen, (0,0,255), (pt.x, pt.y), 5)
-                i += 1
-                if i < 15:
-                    pygame.draw.line(self.screen, (255,255,255), (self.car.x, self.car.y), (pt.x, pt.y), 1)
-                elif i >=15 and i < 17:
-                    pygame.draw.line(self.screen, (255,255,255), ((self.car.p1.x + self.car.p2.x)/2, (self.car.p1.y + self.car.p2.y)/2), (pt.x, pt.y), 1)
-                elif i == 17:
-                    pygame.draw.line(self.screen, (255,255,255), (self.car.p1.x , self.car.p1.y ), (pt.x, pt.y), 1)
-                else:
-                    pygame.draw.line(self.screen, (255,255,255), (self.car.p2.x, self.car.p2.y), (pt.x, pt.y), 1)
+            for origin, pt in zip(self.car.ray_origins, self.car.closestRays):
+                if np.isnan(pt[0]):
+                    continue
+                pygame.draw.circle(self.screen, (0,0,255), pt, 5)
+                pygame.draw.line(self.screen, (255,255,255), origin, pt, 1)
 
         #render controll
         pygame.draw.rect(self.screen,(255,255,255),(800, 100, 40, 40),2)
@@ -374,7 +404,9 @@ class RacingEnv:
         pygame.display.update()
 
     def close(self):
-        pygame.quit()
+        if self.screen is not None:
+            import pygame
+            pygame.quit()
 
 
 
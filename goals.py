@@ -1,4 +1,4 @@
-import pygame
+import numpy as np
 
 class Goal:
     def __init__(self, x1, y1, x2, y2):
@@ -10,6 +10,7 @@ class Goal:
         self.isactiv = False
     
     def draw(self, win):
+        import pygame
         pygame.draw.line(win, (0,255,0), (self.x1, self.y1), (self.x2, self.y2), 2)
         if self.isactiv:
             pygame.draw.line(win, (255,0,0), (self.x1, self.y1), (self.x2, self.y2), 2)
@@ -97,3 +98,53 @@ def getGoals():
     goals[len(goals)-1].isactiv = True
 
     return(goals)
+
+
+class GoalTracker:
+    """
+    Tracks the one live goal of a track.
+
+    goals are given in driving order; their endpoints are packed into segments so the
+    env only has to test the active one each step. Only the isactiv flags of the goal
+    being left and the goal being entered are touched, so reset is cheap as well.
+    """
+
+    def __init__(self, goals):
+        self.goals = goals
+        self.segments = np.array([(g.x1, g.y1, g.x2, g.y2) for g in goals], dtype=np.float64)
+        for goal in goals:
+            goal.isactiv = False
+        self.index = 0
+        self.reset()
+
+    def reset(self):
+        self.activate(0)
+        self.laps = 0
+        self.passed = 0
+
+    @property
+    def active(self):
+        return self.goals[self.index]
+
+    @property
+    def lap_progress(self):
+        # Fraction of the current lap completed
+        return self.index / len(self.goals)
+
+    def activate(self, index):
+        self.goals[self.index].isactiv = False
+        self.index = index
+        self.goals[index].isactiv = True
+
+    def advance(self):
+        self.passed += 1
+        if self.index + 1 == len(self.goals):
+            self.laps += 1
+            self.activate(0)
+        else:
+            self.activate(self.index + 1)
+
+
+def getGoalTracker():
+    # getGoals() starts on its last goal and the car works backwards through the list
+    return GoalTracker(getGoals()[::-1])
@@ -0,0 +1,45 @@
+import math
+from functools import lru_cache
+import numpy as np
+from raycast import RAY_ANGLES, ray_directions
+
+# Car.turn only changes the heading in 15 degree steps, so a car can only face 24 ways
+HEADING_STEP = math.radians(15)
+N_HEADINGS = 24
+
+
+def heading_index(angle):
+    """Index into the heading tables for angle, or None if angle is not a multiple of HEADING_STEP."""
+    index = round(angle / HEADING_STEP)
+    if abs(angle - index * HEADING_STEP) < 1e-9:
+        return index % N_HEADINGS
+    return None
+
+
+class HeadingTable:
+    """
+    Precomputed geometry for every quantized heading of a width x height car.
+
+    velocity[k]: unit vector a velocity of 1 moves the car by (utils.rotate(Point(0, 0), Point(0, 1), angle)).
+    corners[k]:  offsets of the four rotated corners from the car centre (utils.rotate_rect order).
+    rays[k]:     (18, 2) ray vectors for raycast.RAY_ANGLES.
+    """
+
+    def __init__(self, width, height):
+        hw, hh = width / 2, height / 2
+        self.velocity = []
+        self.corners = []
+        self.rays = np.empty((N_HEADINGS, len(RAY_ANGLES), 2))
+
+        for k in range(N_HEADINGS):
+            angle = k * HEADING_STEP
+            cos, sin = math.cos(angle), math.sin(angle)
+            self.velocity.append((-sin, cos))
+            self.corners.append(tuple((cos * x - sin * y, sin * x + cos * y)
+                                      for x, y in ((-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh))))
+            self.rays[k] = ray_directions(angle + RAY_ANGLES)
+
+
+@lru_cache(maxsize=None)
+def heading_table(width, height):
+    return HeadingTable(width, height)
@@ -0,0 +1,89 @@
+import csv
+import os
+import time
+from contextlib import nullcontext
+
+# Reused for every phase of a disabled timer: a with-block on it costs ~0.1us
+NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    # One per phase name, reused for every with-block so timing allocates nothing
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.timer.totals[self.name] = self.timer.totals.get(self.name, 0.0) + elapsed
+        self.timer.counts[self.name] = self.timer.counts.get(self.name, 0) + 1
+
+
+class PhaseTimer:
+    """
+    Per-phase wall-clock counters for the hot paths, summed over an episode.
+
+        with timer.phase("cast"):
+            ...
+        timer.end_episode(episode)
+
+    end_episode returns {phase: (total seconds, calls)}, resets the counters and, if set up,
+    appends the summary to a CSV file (episode, phase, calls, total_ms, mean_us) and/or logs it
+    as TensorBoard scalars. A disabled timer hands out a shared no-op context and records nothing.
+    """
+
+    def __init__(self, enabled=True, csv_path=None, tensorboard_dir=None):
+        self.enabled = enabled
+        self.totals = {}
+        self.counts = {}
+        self._phases = {}
+
+        self.csv_path = csv_path if enabled else None
+        if self.csv_path and not os.path.exists(self.csv_path):
+            with open(self.csv_path, "w", newline="") as file:
+                csv.writer(file).writerow(["episode", "phase", "calls", "total_ms", "mean_us"])
+
+        self.writer = None
+        if enabled and tensorboard_dir:
+            from torch.utils.tensorboard import SummaryWriter
+            self.writer = SummaryWriter(tensorboard_dir)
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def end_episode(self, episode):
+        if not self.enabled:
+            return {}
+        summary = {name: (total, self.counts[name]) for name, total in self.totals.items()}
+        self.totals = {}
+        self.counts = {}
+
+        if self.csv_path:
+            with open(self.csv_path, "a", newline="") as file:
+                writer = csv.writer(file)
+                for name, (total, calls) in summary.items():
+                    writer.writerow([episode, name, calls, f"{total * 1e3:.3f}", f"{total / calls * 1e6:.2f}"])
+        if self.writer is not None:
+            for name, (total, calls) in summary.items():
+                self.writer.add_scalar(f"time_ms/{name}", total * 1e3, episode)
+                self.writer.add_scalar(f"time_per_call_us/{name}", total / calls * 1e6, episode)
+        return summary
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Shared default for code that takes an optional timer
+NULL_TIMER = PhaseTimer(enabled=False)
@@ -0,0 +1,102 @@
+import numpy as np
+
+RAY_LENGTH = 1000
+
+# Ray angles (degrees, relative to the car heading) and where each ray starts:
+# the first 14 rays leave from the car centre, the last 4 from the front corners
+RAY_ANGLES = np.radians([
+    0, -30, 30, -45, 45, -90, 90, 180,
+    10, -10, 135, -135, 20, -20, 90, -90, 0, 0
+])
+RAY_CENTER = 14
+
+# Below this many walls one dense broadcast is cheaper than walking the grid
+GRID_MIN_SEGMENTS = 128
+
+
+def pack_segments(segments):
+    """
+    Pack wall-like objects (anything with x1, y1, x2, y2) into a (n, 4) float array.
+    Arrays are passed through unchanged.
+    """
+    if isinstance(segments, np.ndarray):
+        return segments
+    return np.array([(s.x1, s.y1, s.x2, s.y2) for s in segments], dtype=np.float64).reshape(-1, 4)
+
+
+def ray_directions(angles, length=RAY_LENGTH):
+    """Ray vectors for the given headings, same convention as utils.rotate(Point(0, 0), Point(0, -length), angle)."""
+    return np.stack((length * np.sin(angles), -length * np.cos(angles)), axis=-1)
+
+
+def _intersect(x1, y1, x2, y2, x3, y3, x4, y4, cx, cy):
+    """Same segment test as utils.Ray.cast, elementwise; returns the hit mask, hit points and distances to (cx, cy)."""
+    denominator = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / denominator
+        u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / denominator
+        px = np.floor(x1 + t * (x2 - x1))
+        py = np.floor(y1 + t * (y2 - y1))
+    hit = (denominator != 0) & (0 < t) & (t < 1) & (0 < u) & (u < 1)
+
+    dist = np.sqrt((cx - px) ** 2 + (cy - py) ** 2)
+    dist[~hit] = np.inf
+    return hit, px, py, dist
+
+
+def cast_rays(origins, directions, segments, centers, grid=None):
+    """
+    Intersect every ray with every segment in one broadcast.
+
+    Args:
+        origins: (R, 2) ray start points.
+        directions: (R, 2) ray vectors, the ray ends at origin + direction.
+        segments: (W, 4) packed wall endpoints.
+        centers: (R, 2) or (2,) points the hit distance is measured from.
+        grid: Optional spatial.WallGrid built over segments; only walls in the cells a ray crosses are tested.
+            Ignored for tracks with fewer than GRID_MIN_SEGMENTS walls.
+
+    Returns:
+        distances: (R,) distance to the closest hit, RAY_LENGTH when the ray hits nothing.
+        points: (R, 2) closest hit points (floored like utils.Ray.cast), NaN when the ray hits nothing.
+    """
+    n = len(origins)
+    distances = np.full(n, float(RAY_LENGTH))
+    points = np.full((n, 2), np.nan)
+    if len(segments) == 0:
+        return distances, points
+
+    centers = np.broadcast_to(np.asarray(centers, dtype=np.float64).reshape(-1, 2), (n, 2))
+    ends = origins + directions
+
+    if grid is not None and len(segments) >= GRID_MIN_SEGMENTS:
+        ray_idx, wall_idx = grid.ray_candidates(origins, directions)
+        seg = segments[wall_idx]
+        hit, px, py, dist = _intersect(seg[:, 0], seg[:, 1], seg[:, 2], seg[:, 3],
+                                       origins[ray_idx, 0], origins[ray_idx, 1], ends[ray_idx, 0], ends[ray_idx, 1],
+                                       centers[ray_idx, 0], centers[ray_idx, 1])
+        ray_idx, px, py, dist = ray_idx[hit], px[hit], py[hit], dist[hit]
+
+        # Pairs come sorted by (ray, wall): a stable sort on distance keeps the first wall on ties
+        order = np.lexsort((dist, ray_idx))
+        ray_idx, px, py, dist = ray_idx[order], px[order], py[order], dist[order]
+        first = np.ones(len(ray_idx), dtype=bool)
+        first[1:] = ray_idx[1:] != ray_idx[:-1]
+        rays = ray_idx[first]
+        distances[rays] = dist[first]
+        points[rays, 0] = px[first]
+        points[rays, 1] = py[first]
+        return distances, points
+
+    hit, px, py, dist = _intersect(segments[:, 0], segments[:, 1], segments[:, 2], segments[:, 3],
+                                   origins[:, 0:1], origins[:, 1:2], ends[:, 0:1], ends[:, 1:2],
+                                   centers[:, 0:1], centers[:, 1:2])
+
+    # Closest hit per ray (first wall wins ties, like the original loop)
+    rows = np.arange(n)
+    closest = np.argmin(dist, axis=1)
+    found = hit[rows, closest]
+    distances[found] = dist[rows, closest][found]
+    points[found, 0] = px[rows, closest][found]
+    points[found, 1] = py[rows, closest][found]
+    return distances, points
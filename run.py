@@ -1,27 +1,65 @@
 import game_env
 import pygame
 import numpy as np
-from dqn import DQNAgent
+from dqn import DQNAgent, MemmapReplayBuffer, LearnerThread
+from profiling import PhaseTimer
+from trajectory import load_demonstrations
+from checkpointing import CheckpointManager
 
 TOTAL_GAMETIME = 1000 # Max game time for one episode
 N_EPISODES = 10000
 REPLACE_TARGET = 50
-
-game = game_env.RacingEnv()
+HEADLESS = False  # train without a window: no rendering and no pygame
+REPLAY_DIR = None  # e.g. "replay": keep the replay buffer on disk and reuse it across restarts
+MEM_SIZE = 10000
+N_STEP = 1  # e.g. 3: learn from n-step returns instead of one-step targets
+ASYNC_LEARNER = False  # run dqn_agent.learn() on a background thread while the game keeps stepping
+REPLAY_RATIO = 1.0  # async learner updates per game step
+SYNC_INTERVAL = 10  # async learner updates between copies of the weights into the acting network
+COMPILE_LEARN = None  # "script" or "compile" to fuse the learn step
+TORCH_THREADS = None  # intra-op threads for the learner, None keeps torch's default
+DEMO_DIR = None  # e.g. "demonstrations" (see collector.py): preload recorded human play into the replay buffer
+PRETRAIN_STEPS = 10000  # learner updates on the demonstrations before the first episode
+CHECKPOINT_DIR = None  # e.g. "run_checkpoints": save the full training state and resume from it on restart
+KEEP_CHECKPOINTS = 3
+PROFILE = False  # time each phase of the loop, summed per episode
+PROFILE_CSV = "phase_times.csv"
+PROFILE_TENSORBOARD = None  # e.g. "runs/phases" to log the phase times as TensorBoard scalars
+
+timer = PhaseTimer(PROFILE, PROFILE_CSV, PROFILE_TENSORBOARD)
+
+game = game_env.RacingEnv(headless=HEADLESS, timer=timer)
 game.fps = 60
 
 GameTime = 0 
 GameHistory = []
 renderFlag = False
 
-dqn_agent = DQNAgent(alpha=0.0005, gamma=0.99, n_actions=5, epsilon=1.00, epsilon_end=0.10, epsilon_dec=0.9995, replace_target= REPLACE_TARGET, batch_size=512, input_dims=19)
+memory = MemmapReplayBuffer(REPLAY_DIR, MEM_SIZE, 19, 5) if REPLAY_DIR else None
+dqn_agent = DQNAgent(alpha=0.0005, gamma=0.99, n_actions=5, epsilon=1.00, epsilon_end=0.10, epsilon_dec=0.9995, replace_target= REPLACE_TARGET, batch_size=512, input_dims=19, mem_size=MEM_SIZE, memory=memory, n_step=N_STEP, compile_learn=COMPILE_LEARN, num_threads=TORCH_THREADS)
+
+learner = LearnerThread(dqn_agent, REPLAY_RATIO, SYNC_INTERVAL) if ASYNC_LEARNER else None
+checkpoints = CheckpointManager(CHECKPOINT_DIR, KEEP_CHECKPOINTS) if CHECKPOINT_DIR else None
 
 ddqn_scores = []
 eps_history = []
 
 
 def run():
-    for e in range(N_EPISODES):
+    start_episode = 0
+    restored = checkpoints.restore(dqn_agent) if checkpoints is not None else None
+    if restored is not None:
+        episode, extra = restored
+        start_episode = episode + 1
+        ddqn_scores.extend(extra["scores"])
+        eps_history.extend(extra["eps_history"])
+        print('resumed from episode', episode)
+    elif DEMO_DIR:
+        n = load_demonstrations(dqn_agent.memory, DEMO_DIR)
+        print('loaded', n, 'demonstration transitions, pretraining for', PRETRAIN_STEPS, 'steps')
+        dqn_agent.pretrain(PRETRAIN_STEPS)
+
+    for e in range(start_episode, N_EPISODES):
         
         game.reset() #reset env 
 
@@ -39,10 +77,12 @@ def run():
         if e % 10 == 0 and e > 0: # render every 10 episodes
             renderFlag = True
         while not done:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: 
-                    return
-            action = dqn_agent.choose_action(observation)
+            if not HEADLESS:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT: 
+                        return
+            with timer.phase("choose_action"):
+                action = dqn_agent.choose_action(observation)
 
             observation_, reward, done = game.step(action)
             observation_ = np.array(observation_)
@@ -56,24 +96,44 @@ def run():
                 counter = 0
 
             score += reward
-            dqn_agent.remember(observation, action, reward, observation_, int(done))
+            with timer.phase("remember"):
+                dqn_agent.remember(observation, action, reward, observation_, int(done))
             observation = observation_
-            dqn_agent.learn()
+            if learner is not None:
+                learner.add_steps(1)
+            else:
+                with timer.phase("learn"):
+                    dqn_agent.learn()
             
             gtime += 1
 
             if gtime >= TOTAL_GAMETIME:
                 done = True
 
-            if renderFlag:
-                game.render(action)
+            if renderFlag and not HEADLESS:
+                with timer.phase("render"):
+                    game.render(action)
+
+        if memory is not None:
+            memory.flush()
+        timer.end_episode(e)
 
         eps_history.append(dqn_agent.epsilon)
         ddqn_scores.append(score)
         avg_score = np.mean(ddqn_scores[max(0, e-100):(e+1)])
 
         if e % 10 == 0 and e > 10:
-            dqn_agent.save_model("model_weights")
+            if learner is not None:
+                learner.save_model("model_weights")
+            else:
+                dqn_agent.save_model("model_weights")
+            if checkpoints is not None:
+                # Snapshot only, the write happens on the checkpoint thread
+                if learner is not None:
+                    with learner.update_lock:
+                        checkpoints.save(dqn_agent, e, {"scores": list(ddqn_scores), "eps_history": list(eps_history)})
+                else:
+                    checkpoints.save(dqn_agent, e, {"scores": list(ddqn_scores), "eps_history": list(eps_history)})
             print("save model")
             
         print('episode: ', e,'score: %.2f' % score,
@@ -81,4 +141,13 @@ def run():
               ' epsilon: ', dqn_agent.epsilon,
               ' memory size', dqn_agent.memory.mem_cntr % dqn_agent.memory.mem_size)
 
-run()
+if learner is not None:
+    learner.start()
+try:
+    run()
+finally:
+    if learner is not None:
+        learner.stop()
+    if checkpoints is not None:
+        checkpoints.close()
+    timer.close()
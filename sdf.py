@@ -0,0 +1,188 @@
+import hashlib
+import math
+import numpy as np
+from raycast import RAY_LENGTH, pack_segments
+from track_compiler import CACHE_DIR, COMPILER_VERSION, cached_array
+
+WIDTH, HEIGHT = 1000, 600
+
+HIT_EPSILON = 0.5  # a marching ray stops once it is this close to a wall
+MAX_STEPS = 256
+
+
+def build_field(segments, width=WIDTH, height=HEIGHT):
+    """
+    Signed distance and closest wall index for every integer point (x, y) of the playfield.
+
+    Distance is exact (point to segment); the sign comes from the even-odd rule along +x, so it
+    is positive between the track's closed wall loops and negative off the track.
+
+    Returns:
+        (2, height, width) float32: signed distances, then the index of the closest wall.
+    """
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float64)
+    best = np.full((height, width), np.inf)
+    nearest = np.zeros((height, width), dtype=np.float32)
+    inside = np.zeros((height, width), dtype=bool)
+
+    for i, (x1, y1, x2, y2) in enumerate(segments):
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        t = np.clip(((xs - x1) * dx + (ys - y1) * dy) / length2, 0, 1) if length2 > 0 else 0.0
+        d2 = (xs - x1 - t * dx) ** 2 + (ys - y1 - t * dy) ** 2
+        closer = d2 < best
+        best[closer] = d2[closer]
+        nearest[closer] = i
+
+        # Even-odd rule: flip every point whose +x ray crosses this wall (half-open in y so shared vertices count once)
+        if dy != 0:
+            rows = np.arange(max(int(np.ceil(min(y1, y2))), 0), min(int(np.ceil(max(y1, y2))), height))
+            crossing = x1 + (rows - y1) * dx / dy
+            inside[rows] ^= xs[rows] < crossing[:, None]
+
+    field = np.empty((2, height, width), dtype=np.float32)
+    field[0] = np.where(inside, 1, -1) * np.sqrt(best)
+    field[1] = nearest
+    return field
+
+
+def load_field(segments, width=WIDTH, height=HEIGHT, cache_dir=CACHE_DIR):
+    """build_field, kept in the track cache keyed by a hash of the walls; cache hits are memory-mapped."""
+    segments = np.ascontiguousarray(segments, dtype=np.float64)
+    key = hashlib.sha256(repr((COMPILER_VERSION, width, height)).encode() + segments.tobytes()).hexdigest()
+
+    def build():
+        return build_field(segments, width, height)
+
+    return cached_array("sdf", key, build, cache_dir, mmap_mode="r")
+
+
+class SignedDistanceField:
+    """
+    Raster collision and ray backend over a precomputed signed distance field.
+
+    Accuracy against the exact engine (collision.WallCollider, raycast.cast_rays):
+      - distance() interpolates bilinearly between integer points. The signed distance is
+        1-Lipschitz, so the interpolated value is within 0.71px of the true one.
+      - first_hit() reports a crash when one of 8 outline points (corners and edge midpoints)
+        has negative distance, i.e. lies off the track. It can miss a wall vertex poking less
+        than ~4px into the middle of an edge half, and walls that are not part of a closed loop
+        have no inside to leave. Crashes are otherwise reported on the same step.
+      - cast_rays() sphere-traces: each ray advances by the distance to the closest wall until
+        it is within HIT_EPSILON of one. The hit point is then within HIT_EPSILON + 0.71px of a
+        wall, which moves it along the ray by up to (HIT_EPSILON + 0.71) / sin(a) for a wall hit
+        at angle a: <= 2.4px at 30 degrees, but unbounded for grazing rays. A ray passing within
+        HIT_EPSILON of a wall end also counts as a hit. Rays still marching after MAX_STEPS stop
+        where they are (they are crawling along a wall).
+
+    Every lookup is a fixed handful of array ops whatever the wall count, so it pays off on
+    large (e.g. contour) tracks and batched casting; on the 47-wall track the exact grid
+    engine is faster for a single car.
+    """
+
+    def __init__(self, segments, width=WIDTH, height=HEIGHT, cache_dir=CACHE_DIR):
+        self.segments = pack_segments(segments)
+        self.width = width
+        self.height = height
+        field = load_field(self.segments, width, height, cache_dir)
+        self.values = field[0]
+        self.nearest = field[1]
+
+    def distance(self, x, y):
+        """Bilinearly interpolated signed distance at points (x, y), clamped to the playfield."""
+        x = np.clip(x, 0, self.width - 1)
+        y = np.clip(y, 0, self.height - 1)
+        x0 = np.minimum(x.astype(np.intp), self.width - 2)
+        y0 = np.minimum(y.astype(np.intp), self.height - 2)
+        fx, fy = x - x0, y - y0
+        v = self.values
+        top = v[y0, x0] * (1 - fx) + v[y0, x0 + 1] * fx
+        bottom = v[y0 + 1, x0] * (1 - fx) + v[y0 + 1, x0 + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def closest_wall(self, x, y):
+        xi = np.clip(np.rint(x), 0, self.width - 1).astype(np.intp)
+        yi = np.clip(np.rint(y), 0, self.height - 1).astype(np.intp)
+        return self.nearest[yi, xi].astype(np.intp)
+
+    def first_hits(self, corners):
+        """
+        Args:
+            corners: (N, 4, 2) car corners, in order around each car.
+
+        Returns:
+            (N,) index of the wall closest to the first outline point that is off the track, -1 when none is.
+        """
+        corners = np.asarray(corners, dtype=np.float64)
+        # Corners, then edge midpoints, as in first_hit
+        samples = np.concatenate((corners, (corners + np.roll(corners, -1, axis=1)) / 2), axis=1)
+        x, y = samples[..., 0], samples[..., 1]
+        outside = self.distance(x, y) < 0
+        first = np.argmax(outside, axis=1)
+        rows = np.arange(len(corners))
+        hits = np.full(len(corners), -1)
+        crashed = outside[rows, first]
+        hits[crashed] = self.closest_wall(x[rows, first], y[rows, first])[crashed]
+        return hits
+
+    def _distance_at(self, x, y):
+        # Scalar distance(), plain Python is several times faster than NumPy for one point
+        x = min(max(x, 0.0), self.width - 1.0)
+        y = min(max(y, 0.0), self.height - 1.0)
+        x0 = min(int(x), self.width - 2)
+        y0 = min(int(y), self.height - 2)
+        fx, fy = x - x0, y - y0
+        (a, b), (c, d) = self.values[y0:y0 + 2, x0:x0 + 2].tolist()
+        return (a * (1 - fx) + b * fx) * (1 - fy) + (c * (1 - fx) + d * fx) * fy
+
+    def first_hit(self, outline):
+        """Same as WallCollider.first_hit: index of a wall the car outline crosses, or -1."""
+        cx = sum(x for x, _ in outline) / len(outline)
+        cy = sum(y for _, y in outline) / len(outline)
+        # Every outline point is within radius of the centre, so a centre this far from any wall settles it
+        radius = max(math.hypot(x - cx, y - cy) for x, y in outline)
+        if self._distance_at(cx, cy) > radius + 1:
+            return -1
+
+        # Corners, then edge midpoints
+        points = list(outline) + [((x1 + x2) / 2, (y1 + y2) / 2) for (x1, y1), (x2, y2) in zip(outline, outline[1:] + outline[:1])]
+        for x, y in points:
+            if self._distance_at(x, y) < 0:
+                return int(self.closest_wall(x, y))
+        return -1
+
+    def cast_rays(self, origins, directions, centers, max_steps=MAX_STEPS, hit_epsilon=HIT_EPSILON):
+        """
+        Sphere-traced stand-in for raycast.cast_rays, same arguments and return values
+        (distances from centers to the floored hit points, RAY_LENGTH and NaN for misses).
+        """
+        n = len(origins)
+        centers = np.broadcast_to(np.asarray(centers, dtype=np.float64).reshape(-1, 2), (n, 2))
+        length = np.hypot(directions[:, 0], directions[:, 1])
+        unit = directions / length[:, None]
+
+        t = np.zeros(n)
+        hit = np.zeros(n, dtype=bool)
+        active = np.arange(n)
+        for _ in range(max_steps):
+            px = origins[active, 0] + t[active] * unit[active, 0]
+            py = origins[active, 1] + t[active] * unit[active, 1]
+            d = np.abs(self.distance(px, py))
+
+            arrived = d < hit_epsilon
+            hit[active[arrived]] = True
+            # No walls outside the playfield: leaving it, or reaching the ray's end, is a miss
+            left = (px < 0) | (px > self.width - 1) | (py < 0) | (py > self.height - 1)
+            active = active[~arrived & ~left]
+            t[active] += np.maximum(d[~arrived & ~left], hit_epsilon)
+            active = active[t[active] < length[active]]
+            if len(active) == 0:
+                break
+        hit[active] = True
+
+        points = np.full((n, 2), np.nan)
+        points[hit, 0] = np.floor(origins[hit, 0] + t[hit] * unit[hit, 0])
+        points[hit, 1] = np.floor(origins[hit, 1] + t[hit] * unit[hit, 1])
+        distances = np.full(n, float(RAY_LENGTH))
+        distances[hit] = np.hypot(centers[hit, 0] - points[hit, 0], centers[hit, 1] - points[hit, 1])
+        return distances, points
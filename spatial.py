@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class WallGrid:
+    """
+    Uniform grid over a static set of wall segments.
+
+    Every cell lists the walls that touch it (stored CSR style in cell_start/cell_walls),
+    so ray casts only look at walls in the cells a ray crosses and collision checks only
+    look at walls in the cells under the car's bounding box. Build it once per track.
+    """
+
+    def __init__(self, segments, cell_size=50):
+        self.segments = segments
+        self.cell_size = cell_size
+
+        if len(segments):
+            lo = np.minimum(segments[:, 0:2], segments[:, 2:4]).min(axis=0)
+            hi = np.maximum(segments[:, 0:2], segments[:, 2:4]).max(axis=0)
+        else:
+            lo = hi = np.zeros(2)
+        # Offset by half a pixel so grid lines never pass through integer wall coordinates
+        self.origin = lo - 0.5
+        self.nx, self.ny = (np.floor((hi - self.origin) / cell_size).astype(int) + 1)
+
+        cells, walls = [], []
+        for i, (x1, y1, x2, y2) in enumerate(segments):
+            c = self._cells_touching(x1, y1, x2, y2)
+            cells.append(c)
+            walls.append(np.full(len(c), i))
+        cells = np.concatenate(cells) if cells else np.zeros(0, dtype=int)
+        walls = np.concatenate(walls) if walls else np.zeros(0, dtype=int)
+
+        order = np.argsort(cells, kind="stable")
+        self.cell_walls = walls[order]
+        self.cell_start = np.zeros(self.nx * self.ny + 1, dtype=int)
+        np.cumsum(np.bincount(cells, minlength=self.nx * self.ny), out=self.cell_start[1:])
+
+    @classmethod
+    def from_tables(cls, segments, cell_size, origin, shape, cell_start, cell_walls):
+        """Rebuild a grid from saved tables (see track_compiler.Track) without re-registering the walls."""
+        grid = cls.__new__(cls)
+        grid.segments = segments
+        grid.cell_size = cell_size
+        grid.origin = np.asarray(origin, dtype=np.float64)
+        grid.nx, grid.ny = (int(n) for n in shape)
+        grid.cell_start = cell_start
+        grid.cell_walls = cell_walls
+        return grid
+
+    def _cells_touching(self, x1, y1, x2, y2):
+        """Flat indices of the cells whose (closed) box the segment touches."""
+        cs = self.cell_size
+        ox, oy = self.origin
+        ix0, ix1 = sorted((int((x1 - ox) // cs), int((x2 - ox) // cs)))
+        iy0, iy1 = sorted((int((y1 - oy) // cs), int((y2 - oy) // cs)))
+        ix, iy = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1), indexing="ij")
+        ix, iy = ix.ravel(), iy.ravel()
+
+        # Keep only the bounding-box cells the segment's line actually passes through:
+        # a cell is skipped when all four of its corners lie strictly on one side
+        cx = ox + np.stack((ix, ix + 1, ix + 1, ix), axis=1) * cs
+        cy = oy + np.stack((iy, iy, iy + 1, iy + 1), axis=1) * cs
+        side = (x2 - x1) * (cy - y1) - (y2 - y1) * (cx - x1)
+        keep = ~((side > 0).all(axis=1) | (side < 0).all(axis=1))
+        return ix[keep] * self.ny + iy[keep]
+
+    def _gather(self, owners, cells):
+        """Expand (owner, cell) pairs into (owner, wall) pairs using the CSR tables."""
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        total = counts.sum()
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return np.repeat(owners, counts), self.cell_walls[offsets + np.arange(total)]
+
+    def ray_candidates(self, origins, directions):
+        """
+        Walls in the cells crossed by each ray segment origin -> origin + direction.
+
+        Returns:
+            ray_idx, wall_idx: unique (ray, wall) candidate pairs, sorted by ray then wall.
+        """
+        cs = self.cell_size
+        ox, oy = self.origin
+        n = len(origins)
+        if len(self.segments) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        # Ray parameters where each ray crosses a vertical / horizontal grid line
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tx = (ox + np.arange(self.nx + 1) * cs - origins[:, 0:1]) / directions[:, 0:1]
+            ty = (oy + np.arange(self.ny + 1) * cs - origins[:, 1:2]) / directions[:, 1:2]
+        params = np.concatenate((np.zeros((n, 1)), tx, ty, np.ones((n, 1))), axis=1)
+        params[~((params >= 0) & (params <= 1))] = 1
+        params.sort(axis=1)
+
+        # The midpoint of every interval between crossings lies inside a crossed cell
+        mids = (params[:, :-1] + params[:, 1:]) / 2
+        px = origins[:, 0:1] + mids * directions[:, 0:1]
+        py = origins[:, 1:2] + mids * directions[:, 1:2]
+        ix = np.floor((px - ox) / cs).astype(int)
+        iy = np.floor((py - oy) / cs).astype(int)
+        inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+
+        rays = np.broadcast_to(np.arange(n)[:, None], ix.shape)[inside]
+        ray_idx, wall_idx = self._gather(rays, ix[inside] * self.ny + iy[inside])
+        keys = np.unique(ray_idx * len(self.segments) + wall_idx)
+        return keys // len(self.segments), keys % len(self.segments)
+
+    def box_candidates(self, xmin, ymin, xmax, ymax):
+        """Indices of the walls in the cells overlapped by an axis-aligned box."""
+        cs = self.cell_size
+        ox, oy = self.origin
+        ix0, ix1 = max(int((xmin - ox) // cs), 0), min(int((xmax - ox) // cs), self.nx - 1)
+        iy0, iy1 = max(int((ymin - oy) // cs), 0), min(int((ymax - oy) // cs), self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.zeros(0, dtype=int)
+        ix, iy = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1), indexing="ij")
+        cells = (ix * self.ny + iy).ravel()
+        _, walls = self._gather(np.zeros(len(cells), dtype=int), cells)
+        return np.unique(walls)
@@ -0,0 +1,39 @@
+import math
+from headings import HEADING_STEP, N_HEADINGS, heading_index
+
+
+class SpriteCache:
+    """
+    An image pre-rotated once for each of the N_HEADINGS headings a car can face.
+
+    Nothing is loaded until the first get() (or an explicit load()), which needs an
+    initialised pygame display. Headings that are not a multiple of HEADING_STEP are
+    rotated on the fly.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.original = None
+        self.rotated = None
+
+    def load(self):
+        import pygame
+        self.original = pygame.image.load(self.path).convert()
+        self.original.set_colorkey((0, 0, 0))
+        self.rotated = [pygame.transform.rotate(self.original, 90 - math.degrees(i * HEADING_STEP))
+                        for i in range(N_HEADINGS)]
+
+    def get(self, angle):
+        if self.original is None:
+            self.load()
+
+        index = heading_index(angle)
+        if index is not None:
+            return self.rotated[index]
+
+        import pygame
+        return pygame.transform.rotate(self.original, 90 - math.degrees(angle))
+
+
+# Shared by every Car
+CAR_SPRITES = SpriteCache("assets/car.png")
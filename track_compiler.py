@@ -0,0 +1,230 @@
+import hashlib
+import math
+import os
+import re
+import numpy as np
+import walls
+import goals
+from walls import Wall
+from goals import Goal, GoalTracker
+from spatial import WallGrid
+from raycast import pack_segments
+
+# Part of every track cache key (bundles and sdf fields): bump when either layout or how they are built changes
+COMPILER_VERSION = 3
+CACHE_DIR = "track_cache"
+DEFAULT_SPAWN = (50, 300, math.radians(180))  # x, y, heading, as in RacingEnv.reset
+CELL_SIZE = 50
+
+
+def read_contour(path, scale=1.0):
+    """(n, 2) points from an image_proc.py style file of "x, y" lines, scaled by scale (number or (sx, sy))."""
+    with open(path) as file:
+        points = [tuple(map(float, line.split(","))) for line in file if line.strip()]
+    return np.array(points).reshape(-1, 2) * scale
+
+
+def read_barriers(path):
+    """(m, 4) goal segments from a main.py style reward_barriers.txt, one "(x1, y1),(x2, y2)" per line."""
+    with open(path) as file:
+        rows = [list(map(float, re.findall(r"-?\d+(?:\.\d+)?", line))) for line in file if line.strip()]
+    return np.array(rows).reshape(-1, 4)
+
+
+def simplify(points, epsilon, closed=False):
+    """
+    Ramer-Douglas-Peucker simplification: no dropped point lies further than epsilon from the
+    simplified polyline. Closed loops are split at the point furthest from the first one.
+    """
+    if len(points) < 3 or epsilon <= 0:
+        return points
+    if closed:
+        far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+        first = simplify(points[:far + 1], epsilon)
+        second = simplify(np.concatenate((points[far:], points[:1])), epsilon)
+        return np.concatenate((first[:-1], second[:-1]))
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        (x1, y1), (x2, y2) = points[start], points[end]
+        inner = points[start + 1:end]
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length == 0:
+            dist = np.hypot(inner[:, 0] - x1, inner[:, 1] - y1)
+        else:
+            dist = np.abs((x2 - x1) * (y1 - inner[:, 1]) - (x1 - inner[:, 0]) * (y2 - y1)) / length
+        i = int(np.argmax(dist))
+        if dist[i] > epsilon:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def polyline_segments(points, closed=True):
+    """(n, 4) segments joining consecutive points, and the last back to the first when closed."""
+    ends = np.roll(points, -1, axis=0) if closed else points[1:]
+    return np.concatenate((points[:len(ends)], ends), axis=1)
+
+
+class Track:
+    """
+    A compiled track: packed wall and goal arrays (goals in driving order), the spawn pose,
+    and everything derived from the walls (bounding boxes for WallCollider, WallGrid tables),
+    so an env can start without parsing or indexing anything.
+    """
+
+    # Arrays computed from the walls, stored in the bundle next to them
+    DERIVED = ("bounds", "origin", "shape", "cell_start", "cell_walls")
+    # Everything in a bundle, in the order pack() lays it out; these are integers, stored exactly as float64
+    FIELDS = ("walls", "goals", "spawn", "cell_size") + DERIVED
+    INTEGER_FIELDS = ("shape", "cell_start", "cell_walls")
+
+    def __init__(self, walls, goals, spawn=DEFAULT_SPAWN, cell_size=CELL_SIZE, derived=None):
+        self.walls = np.asarray(walls, dtype=np.float64).reshape(-1, 4)
+        self.goals = np.asarray(goals, dtype=np.float64).reshape(-1, 4)
+        self.spawn = tuple(float(v) for v in spawn)
+        self.cell_size = cell_size
+
+        if derived is None:
+            grid = WallGrid(self.walls, cell_size)
+            derived = {
+                "bounds": np.concatenate((np.minimum(self.walls[:, 0:2], self.walls[:, 2:4]),
+                                          np.maximum(self.walls[:, 0:2], self.walls[:, 2:4])), axis=1),
+                "origin": grid.origin,
+                "shape": np.array([grid.nx, grid.ny]),
+                "cell_start": grid.cell_start,
+                "cell_walls": grid.cell_walls,
+            }
+        self.derived = derived
+        self.bounds = derived["bounds"]
+
+    def wall_grid(self):
+        d = self.derived
+        return WallGrid.from_tables(self.walls, self.cell_size, d["origin"], d["shape"], d["cell_start"], d["cell_walls"])
+
+    def wall_objects(self):
+        return [Wall(*row) for row in self.walls.tolist()]
+
+    def goal_tracker(self):
+        return GoalTracker([Goal(*row) for row in self.goals.tolist()])
+
+    def pack(self):
+        """
+        The whole track as one flat float64 array: the ndim of every field in FIELDS, then
+        their shapes, then their values.
+        """
+        fields = dict(self.derived, walls=self.walls, goals=self.goals, spawn=self.spawn, cell_size=self.cell_size)
+        arrays = [np.asarray(fields[name], dtype=np.float64) for name in self.FIELDS]
+        header = [array.ndim for array in arrays] + [n for array in arrays for n in array.shape]
+        return np.concatenate([np.array(header, dtype=np.float64)] + [array.ravel() for array in arrays])
+
+    @classmethod
+    def unpack(cls, buffer):
+        ndims = buffer[:len(cls.FIELDS)].astype(int)
+        pos = len(cls.FIELDS)
+        shapes = []
+        for ndim in ndims:
+            shapes.append(tuple(buffer[pos:pos + ndim].astype(int)))
+            pos += ndim
+
+        fields = {}
+        for name, shape in zip(cls.FIELDS, shapes):
+            size = int(np.prod(shape))
+            values = buffer[pos:pos + size].reshape(shape)
+            fields[name] = values.astype(np.int64) if name in cls.INTEGER_FIELDS else values
+            pos += size
+        derived = {name: fields[name] for name in cls.DERIVED}
+        return cls(fields["walls"], fields["goals"], fields["spawn"], float(fields["cell_size"]), derived)
+
+    def save(self, path):
+        save_array(path, self.pack())
+
+    @classmethod
+    def load(cls, path):
+        return cls.unpack(np.load(path, allow_pickle=False))
+
+
+def compile_track(contours=None, barriers=None, epsilon=1.0, spawn=DEFAULT_SPAWN, scale=1.0, cell_size=CELL_SIZE):
+    """
+    Args:
+        contours: contour files, each read as one closed wall loop and simplified to within epsilon
+            pixels. None uses walls.getWalls().
+        barriers: reward_barriers.txt style goal file, in driving order. None uses goals.getGoals()
+            in driving order (reversed).
+        epsilon: simplification tolerance in pixels, 0 keeps every contour point.
+        spawn: (x, y, heading in radians) of the car at reset.
+        scale: factor (or (sx, sy)) applied to contour points, e.g. to map an image onto the 1000x600 playfield.
+    """
+    if contours is None:
+        segments = pack_segments(walls.getWalls())
+    else:
+        loops = [polyline_segments(simplify(read_contour(path, scale), epsilon, closed=True)) for path in contours]
+        segments = np.concatenate(loops)
+
+    if barriers is None:
+        goal_segments = pack_segments(goals.getGoals()[::-1])
+    else:
+        goal_segments = read_barriers(barriers)
+
+    return Track(segments, goal_segments, spawn, cell_size)
+
+
+def source_hash(contours=None, barriers=None, epsilon=1.0, spawn=DEFAULT_SPAWN, scale=1.0, cell_size=CELL_SIZE):
+    """Hash of everything a compiled track depends on: source files (walls.py / goals.py for the built-in track) and options."""
+    digest = hashlib.sha256(repr((COMPILER_VERSION, epsilon, tuple(spawn), np.asarray(scale).tolist(), cell_size)).encode())
+    sources = list(contours) if contours is not None else [walls.__file__]
+    sources.append(barriers if barriers is not None else goals.__file__)
+    for path in sources:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def save_array(path, array):
+    # Written to a temp name first so a half-written file is never picked up from the cache
+    with open(path + ".tmp", "wb") as file:
+        np.save(file, array, allow_pickle=False)
+    os.replace(path + ".tmp", path)
+
+
+def cached_array(name, key, build, cache_dir=CACHE_DIR, mmap_mode=None):
+    """
+    build() -> ndarray, cached as cache_dir/{name}_{key[:16]}.npy. Later calls with the same key
+    load the file instead (plain arrays only, never unpickled); mmap_mode is passed to np.load.
+    """
+    path = os.path.join(cache_dir, f"{name}_{key[:16]}.npy")
+    if os.path.exists(path):
+        return np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+
+    array = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    save_array(path, array)
+    return array
+
+
+def load_track(contours=None, barriers=None, epsilon=1.0, spawn=DEFAULT_SPAWN, scale=1.0, cell_size=CELL_SIZE,
+               cache_dir=CACHE_DIR):
+    """compile_track, cached as a bundle in cache_dir keyed by source_hash; later calls just load the bundle."""
+    key = source_hash(contours, barriers, epsilon, spawn, scale, cell_size)
+
+    def build():
+        return compile_track(contours, barriers, epsilon, spawn, scale, cell_size).pack()
+
+    return Track.unpack(cached_array("track", key, build, cache_dir))
+
+
+if __name__ == "__main__":
+    # python track_compiler.py [contour files...]: compile (or fetch) a bundle and summarize it
+    import sys
+    import time
+    start = time.perf_counter()
+    track = load_track(sys.argv[1:] or None)
+    print(f"{len(track.walls)} walls, {len(track.goals)} goals, spawn {track.spawn}, "
+          f"{(time.perf_counter() - start) * 1e3:.2f} ms")
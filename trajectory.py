@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import numpy as np
+
+# Recorded columns and their dtypes; "states" and "states_" rows hold input_dims values
+COLUMNS = {
+    "states": np.float32,
+    "actions": np.int64,
+    "rewards": np.float32,
+    "states_": np.float32,
+    "dones": np.bool_,
+    "episodes": np.int64,
+}
+
+
+def _chunk_index(name):
+    # chunk_000012 or chunk_000012.npz -> 12, anything else (temp files) -> None
+    stem = name[:-4] if name.endswith(".npz") else name
+    if not stem.startswith("chunk_") or not stem[6:].isdigit():
+        return None
+    return int(stem[6:])
+
+
+def list_chunks(directory):
+    """Chunk paths in directory, in recording order."""
+    if not os.path.isdir(directory):
+        return []
+    chunks = [(index, name) for index, name in ((_chunk_index(name), name) for name in os.listdir(directory))
+              if index is not None]
+    return [os.path.join(directory, name) for _, name in sorted(chunks)]
+
+
+class TrajectoryRecorder:
+    """
+    Records transitions into fixed-size columnar chunks and writes them from a background thread.
+
+    record() only copies one row into preallocated arrays; a full chunk is handed to the writer
+    thread and a fresh one started, so the capture loop never waits on the disk. Each chunk is
+    either a directory of per-column .npy files (the default, TrajectoryReader memory-maps them)
+    or, with compress=True, one compressed .npz. Chunks appear atomically (written under a temp
+    name, then renamed), and numbering continues after any chunks already in directory.
+    """
+
+    def __init__(self, directory, input_dims=19, chunk_size=4096, compress=False):
+        self.directory = directory
+        self.input_dims = input_dims
+        self.chunk_size = chunk_size
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+
+        existing = list_chunks(directory)
+        self.next_chunk = _chunk_index(os.path.basename(existing[-1])) + 1 if existing else 0
+        # Episode ids continue too, so chunks from several sessions can be loaded together
+        self.episode = int(TrajectoryReader(directory).load_column("episodes")[-1]) + 1 if existing else 0
+
+        self._new_chunk()
+        self.queue = queue.Queue()
+        self.error = None
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _new_chunk(self):
+        self.count = 0
+        self.chunk = {}
+        for column, dtype in COLUMNS.items():
+            shape = (self.chunk_size, self.input_dims) if column in ("states", "states_") else (self.chunk_size,)
+            self.chunk[column] = np.zeros(shape, dtype=dtype)
+
+    def record(self, state, action, reward, state_, done):
+        i = self.count
+        chunk = self.chunk
+        chunk["states"][i] = state
+        chunk["actions"][i] = action
+        chunk["rewards"][i] = reward
+        # Crashes return None as the next state, store zeros instead
+        if state_ is not None and np.asarray(state_).dtype != object:
+            chunk["states_"][i] = state_
+        chunk["dones"][i] = done
+        chunk["episodes"][i] = self.episode
+
+        if done:
+            self.episode += 1
+        self.count += 1
+        if self.count == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Hand the current (possibly partial) chunk to the writer thread."""
+        if self.count == 0:
+            return
+        chunk = {column: array[:self.count] for column, array in self.chunk.items()}
+        self.queue.put((self.next_chunk, chunk))
+        self.next_chunk += 1
+        self._new_chunk()
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception as error:
+                self.error = error
+
+    def _write(self, index, chunk):
+        name = os.path.join(self.directory, f"chunk_{index:06d}")
+        if self.compress:
+            with open(name + ".tmp.npz", "wb") as file:
+                np.savez_compressed(file, **chunk)
+            os.replace(name + ".tmp.npz", name + ".npz")
+        else:
+            os.makedirs(name + ".tmp", exist_ok=True)
+            for column, array in chunk.items():
+                np.save(os.path.join(name + ".tmp", column + ".npy"), array)
+            os.replace(name + ".tmp", name)
+
+    def close(self):
+        """Flush, wait for every chunk to be written and stop the writer thread."""
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+
+class TrajectoryReader:
+    """
+    Reads chunks written by TrajectoryRecorder. .npy chunks are memory-mapped (read-only),
+    .npz chunks are decompressed on access.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.paths = list_chunks(directory)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def read_chunk(self, path, columns=None):
+        columns = list(COLUMNS) if columns is None else columns
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return {column: data[column] for column in columns}
+        return {column: np.load(os.path.join(path, column + ".npy"), mmap_mode="r") for column in columns}
+
+    def chunks(self, columns=None):
+        """Yield each chunk as a dict of column arrays, in recording order."""
+        for path in self.paths:
+            yield self.read_chunk(path, columns)
+
+    def load_column(self, column):
+        arrays = [chunk[column] for chunk in self.chunks([column])]
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=COLUMNS[column])
+
+    def load(self):
+        """Every recorded transition as one dict of (in-memory) column arrays."""
+        return {column: self.load_column(column) for column in COLUMNS}
+
+
+def load_demonstrations(memory, directory, max_transitions=None):
+    """
+    Stream recorded transitions into a replay buffer, one vectorized store_batch per chunk.
+
+    Args:
+        memory: any ReplayBuffer (or subclass) with store_batch.
+        directory: recorder directory, e.g. collector.DEMO_DIR.
+        max_transitions: stop after this many transitions, None loads everything.
+
+    Returns:
+        Number of transitions stored.
+    """
+    stored = 0
+    for chunk in TrajectoryReader(directory).chunks(["states", "actions", "rewards", "states_", "dones"]):
+        n = len(chunk["actions"])
+        if max_transitions is not None:
+            n = min(n, max_transitions - stored)
+            if n <= 0:
+                break
+        memory.store_batch(chunk["states"][:n], chunk["actions"][:n], chunk["rewards"][:n],
+                           chunk["states_"][:n], chunk["dones"][:n])
+        stored += n
+    return stored
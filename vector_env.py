@@ -0,0 +1,176 @@
+import math
+import numpy as np
+from walls import getWalls
+from goals import getGoalTracker
+from spatial import WallGrid
+from collision import WallCollider
+from sdf import SignedDistanceField
+from raycast import RAY_ANGLES, RAY_CENTER, RAY_LENGTH, pack_segments, ray_directions, cast_rays
+from game_env import GOALREWARD, LIFE_REWARD, PENALTY
+
+# (velocity change, turn direction) for each Car.action choice
+ACTION_TABLE = np.array([
+    (0, 0),    # 0: Do nothing
+    (1, 0),    # 1: Move forward
+    (0, -1),   # 2: Turn left
+    (0, 1),    # 3: Turn right
+    (-1, 0),   # 4: Move backward
+    (-1, 1),   # 5: Move backward, turn right
+    (-1, -1),  # 6: Move backward, turn left
+    (1, -1),   # 7: Move forward, turn left
+    (1, 1),    # 8: Move forward, turn right
+])
+
+SPAWN_X, SPAWN_Y = 50, 300
+SPAWN_ANGLE = math.radians(180)
+TURN_STEP = math.radians(15)
+
+
+class VectorRacingEnv:
+    """
+    N cars on the same track, stored as NumPy arrays instead of Car objects.
+
+    step(actions) runs the Car.action / Car.update physics, goal scoring, wall collision
+    and ray observations for the whole batch at once. Cars that crash (or hit max_steps)
+    are reset in place, so the returned observation for a finished car is its first
+    observation of the next episode.
+    """
+
+    def __init__(self, n_envs, walls=None, max_steps=None, sdf=False):
+        self.n_envs = n_envs
+        self.max_steps = max_steps
+
+        # Car constants, same as Car
+        self.width = 14
+        self.height = 30
+        self.max_velocity = 15
+        self.acceleration = 1
+
+        self.walls = getWalls() if walls is None else walls
+        self.wall_segments = pack_segments(self.walls)
+        self.wall_grid = WallGrid(self.wall_segments)
+        self.collider = WallCollider(self.wall_segments, self.wall_grid)
+        # Optional raster backend (see sdf.py), also used for the rays
+        self.sdf = SignedDistanceField(self.wall_segments) if sdf else None
+        if self.sdf is not None:
+            self.collider = self.sdf
+        self.goal_segments = getGoalTracker().segments
+
+        self.position = np.zeros((n_envs, 2))
+        self.velocity = np.zeros(n_envs)
+        self.angle = np.zeros(n_envs)
+        self.target_angle = np.zeros(n_envs)
+        self.corners = np.zeros((n_envs, 4, 2))
+        self.goal_index = np.zeros(n_envs, dtype=np.int64)
+        self.laps = np.zeros(n_envs, dtype=np.int64)
+        self.points = np.zeros(n_envs)
+        self.steps = np.zeros(n_envs, dtype=np.int64)
+        self.collided_wall = np.full(n_envs, -1)
+
+        self.reset()
+
+    def reset(self):
+        self.reset_cars(np.ones(self.n_envs, dtype=bool))
+        return self.cast()
+
+    def reset_cars(self, mask):
+        self.position[mask] = (SPAWN_X, SPAWN_Y)
+        self.velocity[mask] = 0
+        self.angle[mask] = SPAWN_ANGLE
+        self.target_angle[mask] = SPAWN_ANGLE
+        self.goal_index[mask] = 0
+        self.laps[mask] = 0
+        self.points[mask] = 0
+        self.steps[mask] = 0
+        self.update_corners()
+
+    def update_corners(self):
+        # Same arithmetic as Car.update_corners / utils.rotate_rect
+        hw, hh = self.width / 2, self.height / 2
+        x, y = self.position[:, 0:1], self.position[:, 1:2]
+        px = np.concatenate((x - hw, x + hw, x + hw, x - hw), axis=1)
+        py = np.concatenate((y - hh, y - hh, y + hh, y + hh), axis=1)
+        cx = (px[:, 0:1] + px[:, 2:3]) / 2
+        cy = (py[:, 0:1] + py[:, 2:3]) / 2
+        cos, sin = np.cos(self.target_angle)[:, None], np.sin(self.target_angle)[:, None]
+        self.corners[:, :, 0] = cx + cos * (px - cx) - sin * (py - cy)
+        self.corners[:, :, 1] = cy + sin * (px - cx) + cos * (py - cy)
+
+    def step(self, actions):
+        """
+        Args:
+            actions: (N,) Car.action choices, one per car.
+
+        Returns:
+            observations: (N, 19) normalized ray distances and velocity.
+            rewards: (N,) step rewards.
+            dones: (N,) True where the car crashed (or ran out of steps) and was reset.
+        """
+        dv, turn = ACTION_TABLE[np.asarray(actions)].T
+
+        # Car.action / Car.update
+        self.velocity = np.clip(self.velocity + dv * self.acceleration, -self.max_velocity, self.max_velocity)
+        self.target_angle += turn * TURN_STEP
+        self.angle[:] = self.target_angle
+        self.position[:, 0] -= np.sin(self.angle) * self.velocity
+        self.position[:, 1] += np.cos(self.angle) * self.velocity
+        self.update_corners()
+        self.steps += 1
+
+        rewards = np.full(self.n_envs, float(LIFE_REWARD))
+
+        scored = self.score()
+        rewards[scored] += GOALREWARD
+        self.points[scored] += GOALREWARD
+        self.goal_index[scored] += 1
+        lapped = self.goal_index == len(self.goal_segments)
+        self.goal_index[lapped] = 0
+        self.laps[lapped] += 1
+
+        self.collided_wall = self.collider.first_hits(self.corners)
+        dones = self.collided_wall >= 0
+        rewards[dones] += PENALTY
+        if self.max_steps is not None:
+            dones |= self.steps >= self.max_steps
+
+        if dones.any():
+            self.reset_cars(dones)
+
+        return self.cast(), rewards, dones
+
+    def score(self):
+        """True for cars whose 50px forward line crosses their active goal within 20px of the car (see Car.score)."""
+        x1, y1, x2, y2 = self.goal_segments[self.goal_index].T
+        x3, y3 = self.position[:, 0], self.position[:, 1]
+        x4 = x3 + 50 * np.sin(self.angle)
+        y4 = y3 - 50 * np.cos(self.angle)
+
+        denominator = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / denominator
+            u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / denominator
+            ix = x1 + t * (x2 - x1)
+            iy = y1 + t * (y2 - y1)
+        crossed = (denominator != 0) & (0 < t) & (t < 1) & (0 < u) & (u < 1)
+
+        return crossed & (np.sqrt((x3 - ix) ** 2 + (y3 - iy) ** 2) < 20)
+
+    def cast(self):
+        """(N, 19) observations: 18 normalized ray distances per car plus the normalized velocity."""
+        n_rays = len(RAY_ANGLES)
+        origins = np.empty((self.n_envs, n_rays, 2))
+        origins[:, :RAY_CENTER] = self.position[:, None, :]
+        origins[:, RAY_CENTER:] = self.corners[:, [0, 1, 0, 1]]
+        angles = self.target_angle[:, None] + RAY_ANGLES
+        centers = np.repeat(self.position, n_rays, axis=0)
+
+        if self.sdf is not None:
+            distances, _ = self.sdf.cast_rays(origins.reshape(-1, 2), ray_directions(angles.ravel()), centers)
+        else:
+            distances, _ = cast_rays(origins.reshape(-1, 2), ray_directions(angles.ravel()), self.wall_segments,
+                                     centers, self.wall_grid)
+
+        observations = np.empty((self.n_envs, n_rays + 1))
+        observations[:, :-1] = (RAY_LENGTH - distances.reshape(self.n_envs, n_rays)) / RAY_LENGTH
+        observations[:, -1] = self.velocity / self.max_velocity
+        return observations
@@ -1,5 +1,3 @@
-import pygame
-
 class Wall:
     def __init__(self, x1, y1, x2, y2):
         self.x1 = x1
@@ -8,6 +6,7 @@ class Wall:
         self.y2 = y2
     
     def draw(self, win):
+        import pygame
         pygame.draw.line(win, (255,255,255), (self.x1, self.y1), (self.x2, self.y2), 5)
 
 def getWalls():
@@ -110,4 +109,4 @@ def getWalls():
     walls.append(wall47)
     walls.append(wall48)
 
-    return(walls)
\ No newline at end of file
+    return(walls)